@@ -1,21 +1,41 @@
-import cv2
-cap = cv2.VideoCapture('/dev/video2', cv2.CAP_V4L2)
-if not cap.isOpened():
-    raise RuntimeError("Could not open /dev/video0")
-
-# Try to pick a sane mode; comment these if the camera negotiates fine on its own
-cap.set(cv2.CAP_PROP_FRAME_WIDTH,  640)
-cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-cap.set(cv2.CAP_PROP_FPS, 30)
-
-while True:
-    ok, frame = cap.read()
-    if not ok:
-        break
-    cv2.imshow("USB Camera", frame)
-    # press q to quit
-    if cv2.waitKey(1) & 0xFF == ord('q'):
-        break
-
-cap.release()
-cv2.destroyAllWindows()
+import signal
+import gi
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst, GLib
+
+DEVICE = '/dev/video2'
+
+Gst.init(None)
+
+# Frames go v4l2src -> jpegdec -> compositor without the cv2 BGR conversion
+# and imshow copy; io-mode=4 exports the capture buffers as DMABUF
+pipeline = Gst.parse_launch(
+    f"v4l2src device={DEVICE} io-mode=4 ! image/jpeg,width=640,height=480,framerate=30/1 ! "
+    "jpegdec ! videoconvert ! waylandsink"
+)
+loop = GLib.MainLoop()
+
+def on_message(bus, msg):
+    if msg.type == Gst.MessageType.ERROR:
+        err, _ = msg.parse_error()
+        print(f"Camera error: {err.message}")
+        loop.quit()
+    elif msg.type == Gst.MessageType.EOS:
+        loop.quit()
+
+def on_sigint():
+    loop.quit()
+    return False
+
+bus = pipeline.get_bus()
+bus.add_signal_watch()
+bus.connect("message", on_message)
+
+# press Ctrl+C to quit
+GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signal.SIGINT, on_sigint)
+
+if pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+    raise RuntimeError(f"Could not open {DEVICE}")
+
+loop.run()
+pipeline.set_state(Gst.State.NULL)
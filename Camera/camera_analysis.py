@@ -2,101 +2,242 @@
 # Camera Analysis Tool - Generate Excel matrices for all format/resolution/fps combinations
 
 import gi
+import os
+import json
 import glob
 import subprocess
 import time
 import re
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import v4l2_ioctl
 
 # Check if required modules are available
 try:
+    import numpy as np
     import pandas as pd
     from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
+    from openpyxl.styles.fonts import DEFAULT_FONT
+    from openpyxl.utils import get_column_letter
     from openpyxl.utils.dataframe import dataframe_to_rows
 except ImportError as e:
     print(f"Required module missing: {e}")
     print("Please install required modules:")
-    print("pip install pandas openpyxl")
+    print("pip install numpy pandas openpyxl")
     sys.exit(1)
 
 # Initialize GStreamer for testing
 try:
     gi.require_version("Gst", "1.0")
-    from gi.repository import Gst
+    from gi.repository import Gst, GLib
     Gst.init(None)
 except:
     print("Warning: GStreamer not available for testing pipelines")
     Gst = None
 
+# Matches v4l2-ctl --list-formats-ext format, size and interval lines in one pass
+V4L2_LINE_RE = re.compile(
+    r"\[(?P<idx>\d+)\]:\s+'(?P<fmt>[^']+)'\s+\((?P<desc>[^)]+)\)"
+    r"|Size:\s+Discrete\s+(?P<w>\d+)x(?P<h>\d+)"
+    r"|Interval:\s+Discrete\s+[\d.]+s\s+\((?P<fps>[\d.]+)\s+fps\)"
+)
+
+# Pipeline probe settings (used when CameraAnalyzer.test_pipelines is enabled)
+PIPELINE_TEST_TIMEOUT = 1000  # ms to wait for a probe pipeline to preroll
+
+# v4l2src io-modes to try in order: DMABUF avoids a per-frame copy, MMAP is the fallback
+V4L2_IO_MODES = (4, 2)
+
+def is_resource_error(msg):
+    """True if msg is a GStreamer resource error (e.g. unsupported v4l2src io-mode)"""
+    if msg is None or msg.type != Gst.MessageType.ERROR:
+        return False
+    err, _ = msg.parse_error()
+    return err.domain == GLib.quark_to_string(Gst.ResourceError.quark())
+
+# Excel style primitives, built once at import
+HEADER_FONT = Font(bold=True, color="FFFFFF")
+BOLD_FONT = Font(bold=True)
+TITLE_FONT = Font(bold=True, size=14)
+SUBTITLE_FONT = Font(bold=True, size=12)  # "Detailed Data:"
+SUMMARY_TITLE_FONT = Font(bold=True, size=16)
+HEADER_FILL = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
+SUCCESS_FILL = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")  # Light green
+FAIL_FILL = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")     # Light red
+THIN_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'),
+                     top=Side(style='thin'), bottom=Side(style='thin'))
+CENTER = Alignment(horizontal='center', vertical='center')
+WRAP_CENTER = Alignment(horizontal='center', vertical='center', wrap_text=True)
+
+# Width of a matrix cell: "<bandwidth> kbps\n<size> MB\n<works>"
+MATRIX_CELL_WIDTH = len("xxxx.x kbps\nxx.xx MB\n✓") + 2
+
+def styled_cell(ws, value, style):
+    """Write-only cell using one of the workbook's named styles"""
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style
+    return cell
+
+# Serializes console output from concurrent device probes
+_print_lock = threading.Lock()
+
+# Capability cache: device capabilities only change on hot-plug, so keep
+# parsed v4l2-ctl results in memory and on disk for a short time
+CAPS_CACHE_TTL = 60  # seconds
+CAPS_CACHE_FILE = os.path.expanduser('~/.cache/camera_analyzer/caps.json')
+_CAPS_CACHE = {}
+_caps_cache_lock = threading.Lock()
+
+def _caps_cache_key(device_path):
+    return f"{device_path}:{os.stat(device_path).st_rdev}"
+
+def _caps_to_json(capabilities):
+    return {fmt: {'description': data['description'],
+                  'resolutions': [[w, h, sorted(fps_list)] for (w, h), fps_list in data['resolutions'].items()]}
+            for fmt, data in capabilities.items()}
+
+def _caps_from_json(data):
+    return {fmt: {'description': fmt_data['description'],
+                  'resolutions': {(w, h): set(fps_list) for w, h, fps_list in fmt_data['resolutions']}}
+            for fmt, fmt_data in data.items()}
+
+def _read_caps_file():
+    try:
+        with open(CAPS_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_cached_caps(key):
+    """Return cached capabilities for key, or None if missing/expired"""
+    now = time.time()
+    with _caps_cache_lock:
+        entry = _CAPS_CACHE.get(key)
+        if entry is None:
+            stored = _read_caps_file().get(key)
+            if stored:
+                entry = (stored['time'], _caps_from_json(stored['caps']))
+                _CAPS_CACHE[key] = entry
+        if entry and now - entry[0] < CAPS_CACHE_TTL:
+            return entry[1]
+    return None
+
+def store_cached_caps(key, capabilities):
+    """Store capabilities in the memory cache and write through to disk"""
+    now = time.time()
+    with _caps_cache_lock:
+        _CAPS_CACHE[key] = (now, capabilities)
+        try:
+            stored = _read_caps_file()
+            stored[key] = {'time': now, 'caps': _caps_to_json(capabilities)}
+            os.makedirs(os.path.dirname(CAPS_CACHE_FILE), exist_ok=True)
+            tmp_file = CAPS_CACHE_FILE + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(stored, f)
+            os.replace(tmp_file, CAPS_CACHE_FILE)
+        except OSError:
+            pass
+
 class CameraAnalyzer:
-    def __init__(self):
+    def __init__(self, test_pipelines=False):
         self.video_devices = []
         self.test_results = {}
+        # Probing every combination with GStreamer is optional - it can be slow
+        self.test_pipelines = test_pipelines
+
+        # Compressed bits per pixel by (format, pixel tier): VGA and below, up to 720p, above
+        self._BPP = {('H264', 0): 0.08, ('H264', 1): 0.06, ('H264', 2): 0.04,
+                     ('MJPG', 0): 0.5, ('MJPG', 1): 0.4, ('MJPG', 2): 0.3}
+        self._TIER_CUTS = (640*480, 1280*720)
 
     def parse_v4l2_output(self, device_path):
-        """Parse v4l2-ctl output to extract real device capabilities"""
+        """Enumerate real device capabilities via V4L2 ioctls (v4l2-ctl output as fallback)"""
         try:
-            result = subprocess.run(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
-                                  capture_output=True, text=True, timeout=5)
-
-            if result.returncode != 0 or not result.stdout.strip():
-                return {}
+            cache_key = _caps_cache_key(device_path)
+            cached = load_cached_caps(cache_key)
+            if cached is not None:
+                return cached
+
+            try:
+                fd = v4l2_ioctl.open_device(device_path)
+                try:
+                    capabilities = v4l2_ioctl.list_formats_ext(fd)
+                finally:
+                    os.close(fd)
+                store_cached_caps(cache_key, capabilities)
+                return capabilities
+            except OSError:
+                pass  # ioctl path failed, parse v4l2-ctl text instead
+
+            # Parse lines as v4l2-ctl writes them instead of buffering the whole dump
+            proc = subprocess.Popen(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=1)
+            killer = threading.Timer(5, proc.kill)  # same 5 s bound as before
+            killer.start()
 
             capabilities = {}
             current_format = None
+            last_resolution = None
+
+            try:
+                with proc:
+                    for line in proc.stdout:
+                        # One scan per line: format, size or interval
+                        match = V4L2_LINE_RE.search(line)
+                        if not match:
+                            continue
+
+                        if match.group('fmt'):
+                            current_format = match.group('fmt')
+                            capabilities[current_format] = {
+                                'description': match.group('desc'),
+                                'resolutions': {}
+                            }
+                            last_resolution = None
+
+                        elif match.group('w'):
+                            if current_format:
+                                last_resolution = (int(match.group('w')), int(match.group('h')))
+                                resolutions = capabilities[current_format]['resolutions']
+                                if last_resolution not in resolutions:
+                                    resolutions[last_resolution] = set()
+
+                        elif current_format and last_resolution:
+                            # Add this fps to the last resolution found (set drops repeated intervals)
+                            fps = float(match.group('fps'))
+                            capabilities[current_format]['resolutions'][last_resolution].add(fps)
+            finally:
+                killer.cancel()
+
+            if proc.returncode != 0:
+                return {}
 
-            lines = result.stdout.split('\n')
-
-            for line in lines:
-                line = line.strip()
-
-                # Look for format lines
-                format_match = re.search(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)", line)
-                if format_match:
-                    format_code = format_match.group(2)
-                    format_desc = format_match.group(3)
-                    current_format = format_code
-                    capabilities[current_format] = {
-                        'description': format_desc,
-                        'resolutions': {}
-                    }
-                    continue
-
-                # Look for size lines
-                size_match = re.search(r"Size:\s+Discrete\s+(\d+)x(\d+)", line)
-                if size_match and current_format:
-                    width = int(size_match.group(1))
-                    height = int(size_match.group(2))
-                    resolution = (width, height)
-
-                    if resolution not in capabilities[current_format]['resolutions']:
-                        capabilities[current_format]['resolutions'][resolution] = []
-                    continue
-
-                # Look for interval lines
-                interval_match = re.search(r"Interval:\s+Discrete\s+[\d.]+s\s+\(([\d.]+)\s+fps\)", line)
-                if interval_match and current_format:
-                    fps = float(interval_match.group(1))
-                    # Add this fps to the last resolution found
-                    resolutions = capabilities[current_format]['resolutions']
-                    if resolutions:
-                        last_resolution = list(resolutions.keys())[-1]
-                        capabilities[current_format]['resolutions'][last_resolution].append(fps)
-
+            store_cached_caps(cache_key, capabilities)
             return capabilities
 
         except Exception as e:
-            print(f"Error parsing v4l2 output for {device_path}: {e}")
+            with _print_lock:
+                print(f"Error parsing v4l2 output for {device_path}: {e}")
             return {}
 
     def get_device_capabilities(self):
         """Get all video devices and their capabilities"""
         print("Scanning video devices...")
 
-        for device_path in glob.glob('/dev/video*'):
+        paths = glob.glob('/dev/video*')
+        if not paths:
+            print("Total usable devices: 0")
+            return
+
+        # Probes are subprocess/ioctl bound, so run them concurrently
+        with ThreadPoolExecutor(max_workers=min(16, len(paths))) as executor:
+            results = list(executor.map(self.parse_v4l2_output, paths))
+
+        for device_path, capabilities in zip(paths, results):
             print(f"Checking {device_path}...")
-            capabilities = self.parse_v4l2_output(device_path)
 
             if capabilities:
                 device_info = {
@@ -110,42 +251,16 @@ class CameraAnalyzer:
 
         print(f"Total usable devices: {len(self.video_devices)}")
 
-    def estimate_bandwidth_and_filesize(self, format_name, width, height, fps):
-        """Estimate bandwidth (kbps) and 15-second file size (MB)"""
-
-        # Base calculations
-        pixels = width * height
-
-        if format_name == 'H264':
-            # H.264 compression estimates (bits per pixel)
-            if pixels <= 640*480:  # VGA and below
-                bpp = 0.08  # High compression
-            elif pixels <= 1280*720:  # Up to 720p
-                bpp = 0.06
-            else:  # 1080p and above
-                bpp = 0.04
-
-        elif format_name == 'MJPG':
-            # Motion JPEG compression estimates
-            if pixels <= 640*480:
-                bpp = 0.5  # Moderate compression
-            elif pixels <= 1280*720:
-                bpp = 0.4
-            else:
-                bpp = 0.3
-
-        else:  # YUYV (uncompressed)
-            bpp = 16  # YUV422 = 16 bits per pixel
+    def estimate_bandwidth_and_filesize_array(self, format_name, widths, heights, fps):
+        """Bandwidth (kbps) and 15-second file size (MB) over NumPy arrays of one format's modes"""
+        pixels = widths * heights
+        # Tier is 0/1/2 from the two cut-offs; anything not in the table is YUYV (16 bpp, YUV422)
+        tiers = (pixels > self._TIER_CUTS[0]).astype(np.intp) + (pixels > self._TIER_CUTS[1])
+        bpp = np.array([self._BPP.get((format_name, tier), 16) for tier in range(3)])[tiers]
 
-        # Calculate bandwidth (kbps)
-        bits_per_frame = pixels * bpp
-        bits_per_second = bits_per_frame * fps
+        bits_per_second = pixels * bpp * fps
         bandwidth_kbps = bits_per_second / 1000
-
-        # Calculate 15-second file size (MB)
-        bits_15_seconds = bits_per_second * 15
-        bytes_15_seconds = bits_15_seconds / 8
-        mb_15_seconds = bytes_15_seconds / (1024 * 1024)
+        mb_15_seconds = bits_per_second * 15 / 8 / (1024 * 1024)
 
         return bandwidth_kbps, mb_15_seconds
 
@@ -158,28 +273,35 @@ class CameraAnalyzer:
             # Build test pipeline (without display)
             if format_name == 'H264':
                 caps = f"video/x-h264,width={width},height={height},framerate={fps:.0f}/1"
-                pipeline_str = f"v4l2src device={device_path} ! {caps} ! h264parse ! avdec_h264 ! videoconvert ! fakesink"
+                pipeline_tail = f"{caps} ! h264parse ! avdec_h264 ! videoconvert ! fakesink"
             elif format_name == 'MJPG':
                 caps = f"image/jpeg,width={width},height={height},framerate={fps:.0f}/1"
-                pipeline_str = f"v4l2src device={device_path} ! {caps} ! jpegdec ! videoconvert ! fakesink"
+                pipeline_tail = f"{caps} ! jpegdec ! videoconvert ! fakesink"
             else:  # YUYV
                 caps = f"video/x-raw,format=YUY2,width={width},height={height},framerate={fps:.0f}/1"
-                pipeline_str = f"v4l2src device={device_path} ! {caps} ! videoconvert ! fakesink"
+                pipeline_tail = f"{caps} ! videoconvert ! fakesink"
 
-            # Test the pipeline briefly
-            pipeline = Gst.parse_launch(pipeline_str)
-            pipeline.set_state(Gst.State.PLAYING)
+            for io_mode in V4L2_IO_MODES:
+                pipeline_str = f"v4l2src device={device_path} io-mode={io_mode} ! {pipeline_tail}"
 
-            # Let it run for 1 second
-            time.sleep(1)
+                # Test the pipeline briefly
+                pipeline = Gst.parse_launch(pipeline_str)
+                pipeline.set_state(Gst.State.PLAYING)
 
-            # Check if it's working
-            state = pipeline.get_state(Gst.CLOCK_TIME_NONE)
-            success = state[1] == Gst.State.PLAYING
+                # Return as soon as the pipeline prerolls or fails, capped at the timeout
+                msg = pipeline.get_bus().timed_pop_filtered(
+                    PIPELINE_TEST_TIMEOUT * Gst.MSECOND,
+                    Gst.MessageType.ASYNC_DONE | Gst.MessageType.ERROR)
 
-            pipeline.set_state(Gst.State.NULL)
+                pipeline.set_state(Gst.State.NULL)
 
-            return "✓" if success else "✗"
+                if is_resource_error(msg):
+                    continue  # Driver can't do this io-mode, try the next one
+
+                success = msg is not None and msg.type == Gst.MessageType.ASYNC_DONE
+                return "✓" if success else "✗"
+
+            return "✗"
 
         except Exception as e:
             return "✗"
@@ -187,210 +309,181 @@ class CameraAnalyzer:
     def analyze_device(self, device_info):
         """Analyze a single device and create data for Excel"""
         device_path = device_info['path']
-        print(f"\nAnalyzing {device_path}...")
+        # Devices are analyzed concurrently; collect this one's progress and print it as one block
+        log = [f"\nAnalyzing {device_path}..."]
 
         device_data = {}
 
         for format_name, format_data in device_info['capabilities'].items():
-            print(f"  Testing {format_name}...")
-
-            format_results = []
-
-            for resolution, fps_list in format_data['resolutions'].items():
-                width, height = resolution
-
-                for fps in sorted(fps_list):
-                    print(f"    Testing {width}x{height} @ {fps} fps...")
-
-                    # Calculate estimates
-                    bandwidth, filesize = self.estimate_bandwidth_and_filesize(format_name, width, height, fps)
-
-                    # Test if it works (optional - can be slow)
-                    # For now, assume all advertised combinations work
-                    works = "✓"  # self.test_pipeline(device_path, format_name, width, height, fps)
-
-                    format_results.append({
-                        'Resolution': f"{width}x{height}",
-                        'Width': width,
-                        'Height': height,
-                        'FPS': fps,
-                        'Bandwidth (kbps)': round(bandwidth, 1),
-                        'File Size 15s (MB)': round(filesize, 2),
-                        'Works': works
-                    })
-
-            device_data[format_name] = format_results
-
+            log.append(f"  Testing {format_name}...")
+
+            combinations = [(width, height, fps)
+                            for (width, height), fps_list in format_data['resolutions'].items()
+                            for fps in sorted(fps_list)]
+            if not combinations:
+                device_data[format_name] = pd.DataFrame()
+                continue
+
+            # Calculate estimates for every combination in one pass
+            widths, heights, fps_values = (np.array(column, dtype=np.float64) for column in zip(*combinations))
+            bandwidths, filesizes = self.estimate_bandwidth_and_filesize_array(format_name, widths, heights, fps_values)
+
+            # Test if it works (optional - can be slow)
+            # Otherwise assume all advertised combinations work
+            # Probes run one at a time: a capture node has a single streaming owner, so a
+            # second concurrent v4l2src would fail with EBUSY and be recorded as ✗
+            if self.test_pipelines:
+                works_list = [self.test_pipeline(device_path, format_name, width, height, fps)
+                              for width, height, fps in combinations]
+            else:
+                works_list = ["✓"] * len(combinations)
+
+            res_list, w_list, h_list, fps_list_out = [], [], [], []
+            for width, height, fps in combinations:
+                log.append(f"    Testing {width}x{height} @ {fps} fps...")
+                res_list.append(f"{width}x{height}")
+                w_list.append(width)
+                h_list.append(height)
+                fps_list_out.append(fps)
+
+            # Build the frame column by column instead of from per-row dicts
+            device_data[format_name] = pd.DataFrame({
+                'Resolution': res_list,
+                'Width': w_list,
+                'Height': h_list,
+                'FPS': fps_list_out,
+                'Bandwidth (kbps)': bandwidths.round(1),
+                'File Size 15s (MB)': filesizes.round(2),
+                'Works': works_list
+            })
+
+        with _print_lock:
+            print("\n".join(log))
         return device_data
 
     def create_excel_file(self, filename="camera_analysis.xlsx"):
         """Create Excel file with matrices for each device and format"""
         print(f"\nCreating Excel file: {filename}")
 
-        wb = Workbook()
-        # Remove default sheet
-        wb.remove(wb.active)
-
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        success_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")  # Light green
-        fail_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")     # Light red
-        border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                       top=Side(style='thin'), bottom=Side(style='thin'))
-        center_align = Alignment(horizontal='center', vertical='center')
+        # Write-only mode streams rows to disk instead of keeping every cell in memory
+        wb = Workbook(write_only=True)
+
+        # Named styles are per workbook; cells only reference them by name
+        for style in (
+            NamedStyle('header', font=HEADER_FONT, fill=HEADER_FILL, border=THIN_BORDER, alignment=CENTER),
+            NamedStyle('row_label', font=BOLD_FONT, border=THIN_BORDER, alignment=CENTER),
+            NamedStyle('cell', font=DEFAULT_FONT, border=THIN_BORDER, alignment=CENTER),
+            NamedStyle('cell_success', font=DEFAULT_FONT, fill=SUCCESS_FILL, border=THIN_BORDER, alignment=CENTER),
+            NamedStyle('cell_fail', font=DEFAULT_FONT, fill=FAIL_FILL, border=THIN_BORDER, alignment=CENTER),
+            NamedStyle('matrix', font=DEFAULT_FONT, border=THIN_BORDER, alignment=WRAP_CENTER),
+            NamedStyle('matrix_success', font=DEFAULT_FONT, fill=SUCCESS_FILL, border=THIN_BORDER, alignment=WRAP_CENTER),
+            NamedStyle('matrix_fail', font=DEFAULT_FONT, fill=FAIL_FILL, border=THIN_BORDER, alignment=WRAP_CENTER),
+            NamedStyle('title', font=TITLE_FONT),
+            NamedStyle('subtitle', font=SUBTITLE_FONT),
+            NamedStyle('summary_title', font=SUMMARY_TITLE_FONT),
+            NamedStyle('bold', font=BOLD_FONT),
+        ):
+            wb.add_named_style(style)
+
+        works_styles = {"✓": "_success", "✗": "_fail"}
+
+        # Create summary sheet first so it stays at index 0
+        summary_ws = wb.create_sheet(title="Summary")
+        summary_ws.append([styled_cell(summary_ws, "Camera Capabilities Analysis Summary", 'summary_title')])
+        summary_ws.append([])
 
         for device_info in self.video_devices:
+            device_path = device_info['path']
+            summary_ws.append([styled_cell(summary_ws, f"Device: {device_path}", 'bold')])
+
+            for format_name, format_data in device_info['capabilities'].items():
+                res_count = len(format_data['resolutions'])
+                total_combinations = sum(len(fps_list) for fps_list in format_data['resolutions'].values())
+
+                summary_ws.append([None, f"{format_name}: {res_count} resolutions, {total_combinations} total combinations"])
+            summary_ws.append([])
+
+        # Devices are probed side by side, one worker each; probes within a device stay serial
+        with ThreadPoolExecutor(max_workers=len(self.video_devices) or 1) as executor:
+            analyses = list(executor.map(self.analyze_device, self.video_devices))
+
+        for device_info, device_data in zip(self.video_devices, analyses):
             device_path = device_info['path']
             device_name = device_path.replace('/dev/', '')
 
             print(f"Processing {device_path}...")
-            device_data = self.analyze_device(device_info)
 
-            for format_name, format_results in device_data.items():
-                if not format_results:
+            for format_name, df in device_data.items():
+                if df.empty:
                     continue
 
                 # Create worksheet for this device+format combination
                 sheet_name = f"{device_name}_{format_name}"
                 ws = wb.create_sheet(title=sheet_name)
 
-                # Convert to DataFrame for easier manipulation
-                df = pd.DataFrame(format_results)
-
                 # Create a pivot-like structure: Resolution vs FPS
-                resolutions = df['Resolution'].unique()
+                # Resolutions ordered by size, not by their string form
+                resolutions = [f"{width}x{height}" for width, height in sorted(set(zip(df['Width'], df['Height'])))]
                 fps_values = sorted(df['FPS'].unique())
+                detail_headers = ['Resolution', 'FPS', 'Bandwidth (kbps)', 'File Size 15s (MB)', 'Works']
+
+                # Index rows once so each matrix cell is a dict lookup instead of a DataFrame scan
+                lookup = {(resolution, fps): (bandwidth, filesize, works)
+                          for resolution, fps, bandwidth, filesize, works in df[detail_headers].itertuples(index=False)}
+
+                # Column widths must be set before the first row is streamed:
+                # detail table columns from the data, matrix columns from the known cell layout
+                widths = [max(len(header), df[header].astype(str).str.len().max()) + 2 for header in detail_headers]
+                widths[0] = max(widths[0], max(len(r) for r in resolutions) + 2)
+                widths += [0] * (len(fps_values) + 1 - len(widths))
+                for col in range(1, len(fps_values) + 1):
+                    widths[col] = max(widths[col], MATRIX_CELL_WIDTH)
+                for col, width in enumerate(widths, 1):
+                    ws.column_dimensions[get_column_letter(col)].width = min(width, 20)  # Cap at 20
 
                 # Write title
-                ws['A1'] = f"Device: {device_path} - Format: {format_name}"
-                ws['A1'].font = Font(bold=True, size=14)
-                ws.merge_cells('A1:H1')
+                ws.append([styled_cell(ws, f"Device: {device_path} - Format: {format_name}", 'title')])
+                ws.merged_cells.add('A1:H1')
+                ws.append([])
 
                 # Create headers
-                row = 3
-                ws[f'A{row}'] = "Resolution"
-                col = 2
-                for fps in fps_values:
-                    ws.cell(row=row, column=col, value=f"{fps} FPS")
-                    ws.cell(row=row, column=col).font = header_font
-                    ws.cell(row=row, column=col).fill = header_fill
-                    ws.cell(row=row, column=col).alignment = center_align
-                    ws.cell(row=row, column=col).border = border
-                    col += 1
-
-                # Style the resolution header
-                ws[f'A{row}'].font = header_font
-                ws[f'A{row}'].fill = header_fill
-                ws[f'A{row}'].alignment = center_align
-                ws[f'A{row}'].border = border
+                ws.append([styled_cell(ws, "Resolution", 'header')] +
+                          [styled_cell(ws, f"{fps} FPS", 'header') for fps in fps_values])
 
                 # Fill in the matrix
-                row += 1
                 for resolution in resolutions:
-                    ws.cell(row=row, column=1, value=resolution)
-                    ws.cell(row=row, column=1).font = Font(bold=True)
-                    ws.cell(row=row, column=1).alignment = center_align
-                    ws.cell(row=row, column=1).border = border
+                    matrix_row = [styled_cell(ws, resolution, 'row_label')]
 
-                    col = 2
                     for fps in fps_values:
                         # Find matching data
-                        matching = df[(df['Resolution'] == resolution) & (df['FPS'] == fps)]
+                        data = lookup.get((resolution, fps))
 
-                        if not matching.empty:
-                            data = matching.iloc[0]
-                            bandwidth = data['Bandwidth (kbps)']
-                            filesize = data['File Size 15s (MB)']
-                            works = data['Works']
+                        if data is not None:
+                            bandwidth, filesize, works = data
 
                             # Create cell content
                             cell_content = f"{bandwidth} kbps\n{filesize} MB\n{works}"
 
-                            cell = ws.cell(row=row, column=col, value=cell_content)
-                            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                            cell.border = border
-
                             # Color code based on success
-                            if works == "✓":
-                                cell.fill = success_fill
-                            elif works == "✗":
-                                cell.fill = fail_fill
-
+                            matrix_row.append(styled_cell(ws, cell_content, 'matrix' + works_styles.get(works, '')))
                         else:
-                            cell = ws.cell(row=row, column=col, value="N/A")
-                            cell.alignment = center_align
-                            cell.border = border
+                            matrix_row.append(styled_cell(ws, "N/A", 'cell'))
 
-                        col += 1
-                    row += 1
+                    ws.append(matrix_row)
 
                 # Add summary table below
-                row += 2
-                ws.cell(row=row, column=1, value="Detailed Data:")
-                ws.cell(row=row, column=1).font = Font(bold=True, size=12)
-                row += 1
+                ws.append([])
+                ws.append([])
+                ws.append([styled_cell(ws, "Detailed Data:", 'subtitle')])
 
                 # Add detailed table
-                detail_headers = ['Resolution', 'FPS', 'Bandwidth (kbps)', 'File Size 15s (MB)', 'Works']
-                for col, header in enumerate(detail_headers, 1):
-                    cell = ws.cell(row=row, column=col, value=header)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_align
-                    cell.border = border
-
-                row += 1
-                for _, data in df.iterrows():
-                    for col, header in enumerate(detail_headers, 1):
-                        cell = ws.cell(row=row, column=col, value=data[header])
-                        cell.alignment = center_align
-                        cell.border = border
-
-                        if header == 'Works':
-                            if data[header] == "✓":
-                                cell.fill = success_fill
-                            elif data[header] == "✗":
-                                cell.fill = fail_fill
-                    row += 1
-
-                # Auto-adjust column widths (safest approach)
-                from openpyxl.utils import get_column_letter
-
-                for col_num in range(1, ws.max_column + 1):
-                    max_length = 0
-                    column_letter = get_column_letter(col_num)
-
-                    for row_num in range(1, ws.max_row + 1):
-                        cell = ws.cell(row=row_num, column=col_num)
-                        try:
-                            if cell.value and len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-
-                    adjusted_width = min(max_length + 2, 20)  # Cap at 20
-                    ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Create summary sheet
-        summary_ws = wb.create_sheet(title="Summary", index=0)
-        summary_ws['A1'] = "Camera Capabilities Analysis Summary"
-        summary_ws['A1'].font = Font(bold=True, size=16)
-
-        row = 3
-        for device_info in self.video_devices:
-            device_path = device_info['path']
-            summary_ws.cell(row=row, column=1, value=f"Device: {device_path}")
-            summary_ws.cell(row=row, column=1).font = Font(bold=True)
-            row += 1
-
-            for format_name, format_data in device_info['capabilities'].items():
-                res_count = len(format_data['resolutions'])
-                total_combinations = sum(len(fps_list) for fps_list in format_data['resolutions'].values())
+                ws.append([styled_cell(ws, header, 'header') for header in detail_headers])
 
-                summary_ws.cell(row=row, column=2, value=f"{format_name}: {res_count} resolutions, {total_combinations} total combinations")
-                row += 1
-            row += 1
+                for data in df[detail_headers].itertuples(index=False):
+                    detail_row = [styled_cell(ws, value, 'cell') for value in data[:-1]]
+                    works = data[-1]
+                    detail_row.append(styled_cell(ws, works, 'cell' + works_styles.get(works, '')))
+                    ws.append(detail_row)
 
         wb.save(filename)
         print(f"Excel file saved: {filename}")
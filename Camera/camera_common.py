@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# camera_common.py - Device discovery, format probing and sink helpers shared by the camera apps
+import gi
+import re
+import os
+import json
+import ctypes
+import struct
+import threading
+
+gi.require_version("Gst", "1.0")
+from gi.repository import Gst, GLib, Gio
+
+import v4l2_ioctl
+
+_VIDEO_RE = re.compile(r'^video(\d+)$')
+
+def get_video_devices():
+    devices = []
+    try:
+        # One directory read, filtered by name; no per-match glob stat
+        with os.scandir('/dev') as entries:
+            for entry in entries:
+                match = _VIDEO_RE.match(entry.name)
+                # Skip /dev/video0 and /dev/video1; os.access instead of opening the
+                # node, since an open can block while a UVC camera probes
+                if match and int(match.group(1)) >= 2 and os.access(entry.path, os.R_OK):
+                    devices.append((int(match.group(1)), entry.path))
+    except Exception as e:
+        print(f"Device detection error: {e}")
+    # Numeric order, so /dev/video10 comes after /dev/video2
+    return [path for _, path in sorted(devices)] if devices else ['/dev/video2']
+
+def _device_number(path):
+    return int(_VIDEO_RE.match(os.path.basename(path)).group(1))
+
+# inotify on /dev, so hot-plugged cameras are picked up without rescanning
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+# struct inotify_event: wd, mask, cookie, len, then a NUL-padded name of len bytes
+_INOTIFY_EVENT = struct.Struct('iIII')
+_libc = ctypes.CDLL(None, use_errno=True)
+
+def watch_dev():
+    """Non-blocking inotify fd reporting entries created in or deleted from /dev"""
+    fd = _libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+    if _libc.inotify_add_watch(fd, b'/dev', _IN_CREATE | _IN_DELETE) < 0:
+        err = ctypes.get_errno()
+        os.close(fd)
+        raise OSError(err, "inotify_add_watch(/dev) failed")
+    return fd
+
+def read_dev_events(fd):
+    """(mask, name) for every queued event"""
+    try:
+        data = os.read(fd, 4096)
+    except BlockingIOError:
+        return []
+    events = []
+    offset = 0
+    while offset < len(data):
+        _, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+        offset += _INOTIFY_EVENT.size
+        name = data[offset:offset + length].split(b'\0', 1)[0].decode('utf-8', 'replace')
+        offset += length
+        events.append((mask, name))
+    return events
+
+def update_video_devices(devices, fd):
+    """Apply queued /dev create/delete events for video nodes; returns the new device list"""
+    for mask, name in read_dev_events(fd):
+        match = _VIDEO_RE.match(name)
+        if not match or int(match.group(1)) < 2:
+            continue
+        path = '/dev/' + name
+        if mask & _IN_CREATE and path not in devices:
+            devices = sorted(devices + [path], key=_device_number)
+        elif mask & _IN_DELETE and path in devices:
+            devices = [device for device in devices if device != path]
+    return devices or ['/dev/video2']
+
+# Formats are memoized per capture node of a physical camera (bus_info plus the
+# node's sysfs index both survive /dev/videoN renumbering; one camera can expose
+# several nodes with different formats) and invalidated when udev re-announces it
+FORMAT_CACHE_FILE = os.path.expanduser('~/.cache/testscripts/v4l2_formats.json')
+_FORMAT_CACHE = None
+
+def _format_cache():
+    global _FORMAT_CACHE
+    if _FORMAT_CACHE is None:
+        try:
+            with open(FORMAT_CACHE_FILE, 'r') as f:
+                _FORMAT_CACHE = json.load(f)
+        except (OSError, ValueError):
+            _FORMAT_CACHE = {}
+    return _FORMAT_CACHE
+
+def _v4l2_bus_info(device_path):
+    fd = v4l2_ioctl.open_device(device_path)
+    try:
+        return v4l2_ioctl.query_bus_info(fd)
+    finally:
+        os.close(fd)
+
+def _node_index(device_path):
+    with open(f"/sys/class/video4linux/{os.path.basename(device_path)}/index", 'r') as f:
+        return f.read().strip()
+
+def _uevent_mtime(device_path):
+    return os.stat(f"/sys/class/video4linux/{os.path.basename(device_path)}/uevent").st_mtime_ns
+
+def _store_formats(cache_key, stamp, formats):
+    _format_cache()[cache_key] = {'stamp': stamp, 'formats': formats}
+    try:
+        os.makedirs(os.path.dirname(FORMAT_CACHE_FILE), exist_ok=True)
+        tmp_file = FORMAT_CACHE_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(_FORMAT_CACHE, f)
+        os.replace(tmp_file, FORMAT_CACHE_FILE)
+    except OSError:
+        pass
+
+def cached_device_formats(device_path):
+    """(cache_key, stamp, formats); formats is None unless the cache entry is still valid"""
+    try:
+        cache_key = f"{_v4l2_bus_info(device_path)}#{_node_index(device_path)}"
+        stamp = _uevent_mtime(device_path)
+    except OSError:
+        return None, None, None
+    cached = _format_cache().get(cache_key)
+    if cached and cached['stamp'] == stamp:
+        return cache_key, stamp, [tuple(fmt) for fmt in cached['formats']]
+    return cache_key, stamp, None
+
+_FORMAT_RE = re.compile(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)")
+
+def parse_device_formats(output):
+    # One pass over the whole buffer; no per-line split
+    return [(m.group(2), f"{m.group(2)} ({m.group(3)})") for m in _FORMAT_RE.finditer(output)]
+
+FALLBACK_FORMATS = [('MJPG', 'MJPG (Motion-JPEG)'), ('YUYV', 'YUYV (YUV 4:2:2)')]
+
+# Gst.init loads the plugin registry; do it once per process however many windows ask
+_gst_init_lock = threading.Lock()
+_gst_initialized = False
+
+def ensure_gst_init():
+    global _gst_initialized
+    with _gst_init_lock:
+        if not _gst_initialized:
+            Gst.init(None)
+            _gst_initialized = True
+
+def parse_pipeline(pipeline_str):
+    """parse_launch_full with FATAL_ERRORS; names the missing plugins before re-raising"""
+    # A fresh context per parse: a reused one keeps listing elements missing from earlier parses
+    context = Gst.ParseContext.new()
+    try:
+        return Gst.parse_launch_full(pipeline_str, context, Gst.ParseFlags.FATAL_ERRORS)
+    except GLib.Error:
+        missing = context.get_missing_elements()
+        if missing:
+            print(f"Missing GStreamer elements: {', '.join(missing)}")
+        raise
+
+# Formats the compositor accepts, queried from a connected waylandsink once after Gst.init
+_display_caps = None
+# Raw formats the display refused at runtime; they always get videoconvert
+_raw_needs_convert = set()
+
+def _display_sink_caps():
+    global _display_caps
+    if _display_caps is None:
+        # The sink pad template lists every format waylandsink knows, not what this display takes
+        _display_caps = Gst.Caps.new_empty()
+        sink = Gst.ElementFactory.make('waylandsink', None)
+        if sink is not None:
+            if sink.set_state(Gst.State.READY) != Gst.StateChangeReturn.FAILURE:
+                _display_caps = sink.get_static_pad('sink').query_caps(None)
+            sink.set_state(Gst.State.NULL)
+    return _display_caps
+
+def converter_for_raw(gst_format):
+    """'videoconvert ! ' unless the display takes this raw format as-is (most compositors accept YUY2)"""
+    if gst_format in _raw_needs_convert:
+        return "videoconvert ! "
+    caps = Gst.Caps.from_string(f"video/x-raw,format={gst_format}")
+    return "" if caps.can_intersect(_display_sink_caps()) else "videoconvert ! "
+
+def require_converter(gst_format):
+    """Record that the display refused gst_format, so converter_for_raw keeps videoconvert for it"""
+    _raw_needs_convert.add(gst_format)
+
+def is_not_negotiated(err, debug):
+    """True for a caps negotiation failure, reported directly or as a stopped streaming thread"""
+    return (err.matches(Gst.StreamError.quark(), Gst.StreamError.NOT_NEGOTIATED)
+            or 'not-negotiated' in (debug or ''))
+
+
+class FormatProbeMixin:
+    """probe_formats() for a window with self.device and a set_formats(formats) method"""
+
+    def probe_formats(self):
+        """Load formats for self.device from the cache, or run v4l2-ctl without blocking the UI"""
+        cache_key, stamp, formats = cached_device_formats(self.device)
+        if formats:
+            self.set_formats(formats)
+            return
+        try:
+            proc = Gio.Subprocess.new(['v4l2-ctl', '--device', self.device, '--list-formats-ext'],
+                                      Gio.SubprocessFlags.STDOUT_PIPE | Gio.SubprocessFlags.STDERR_SILENCE)
+        except GLib.Error as e:
+            print(f"v4l2-ctl failed: {e.message}")
+            self.set_formats(FALLBACK_FORMATS)
+            return
+        GLib.timeout_add_seconds(3, proc.force_exit)
+        proc.communicate_utf8_async(None, None, self._on_v4l2_done, (self.device, cache_key, stamp))
+
+    def _on_v4l2_done(self, proc, result, probe):
+        device, cache_key, stamp = probe
+        try:
+            _, stdout, _ = proc.communicate_utf8_finish(result)
+        except GLib.Error:
+            stdout = None
+        if device != self.device:
+            return  # Device changed again while v4l2-ctl ran
+        if stdout is None or not proc.get_successful():
+            self.set_formats(FALLBACK_FORMATS)
+            return
+        formats = parse_device_formats(stdout)
+        if formats and cache_key:
+            _store_formats(cache_key, stamp, formats)
+        self.set_formats(formats if formats else [('MJPG', 'MJPG (Motion-JPEG)')])
@@ -4,10 +4,13 @@
 import os
 import gi
 import sys
+import json
 import time
 import subprocess
-import glob
 import re
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import v4l2_ioctl
 
 gi.require_version("Gtk", "3.0")
 gi.require_version("Gst", "1.0")
@@ -16,59 +19,122 @@ from gi.repository import Gtk, Gdk, GLib, Gst
 # Force Wayland backend - EXACTLY like working pattern
 Gdk.set_allowed_backends("wayland")
 
-_prev_total = 0
-_prev_idle = 0
+# Format cache: v4l2-ctl results only change on hot-plug, so reuse them
+# across combo toggles and restarts for a short time
+FORMATS_CACHE_TTL = 60  # seconds
+FORMATS_CACHE_FILE = os.path.expanduser('~/.cache/camera_analyzer/formats.json')
+_FORMATS_CACHE = {}
 
-def read_cpu_percent():
-    global _prev_total, _prev_idle
+def _formats_cache_key(device_path):
+    return f"{device_path}:{os.stat(device_path).st_rdev}"
+
+def _read_formats_file():
     try:
-        with open('/proc/stat', 'r') as f:
-            line = f.readline()
-        parts = [float(x) for x in line.split()[1:8]]
-        user, nice, system, idle, iowait, irq, softirq = parts
-        idle_all = idle + iowait
-        non_idle = user + nice + system + irq + softirq
-        total = idle_all + non_idle
-        if _prev_total == 0:
-            _prev_total, _prev_idle = total, idle_all
-            return 0.0
-        totald = total - _prev_total
-        idled = idle_all - _prev_idle
-        _prev_total, _prev_idle = total, idle_all
-        if totald <= 0:
-            return 0.0
-        return max(0.0, min(100.0, (totald - idled) * 100.0 / totald))
-    except Exception:
-        return 0.0
+        with open(FORMATS_CACHE_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_cached_formats(key):
+    entry = _FORMATS_CACHE.get(key)
+    if entry is None:
+        stored = _read_formats_file().get(key)
+        if stored:
+            entry = (stored['time'], [tuple(fmt) for fmt in stored['formats']])
+            _FORMATS_CACHE[key] = entry
+    if entry and time.time() - entry[0] < FORMATS_CACHE_TTL:
+        return entry[1]
+    return None
+
+def store_cached_formats(key, formats):
+    now = time.time()
+    _FORMATS_CACHE[key] = (now, formats)
+    try:
+        stored = _read_formats_file()
+        stored[key] = {'time': now, 'formats': formats}
+        os.makedirs(os.path.dirname(FORMATS_CACHE_FILE), exist_ok=True)
+        tmp_file = FORMATS_CACHE_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(stored, f)
+        os.replace(tmp_file, FORMATS_CACHE_FILE)
+    except OSError:
+        pass
+
+# v4l2src io-modes to try in order: DMABUF avoids a per-frame copy, MMAP is the fallback
+V4L2_IO_MODES = (4, 2)
+PREROLL_TIMEOUT = 2000  # ms to wait for the camera before trusting an io-mode
+
+def is_resource_error(msg):
+    """True if msg is a GStreamer resource error (e.g. unsupported v4l2src io-mode)"""
+    if msg is None or msg.type != Gst.MessageType.ERROR:
+        return False
+    err, _ = msg.parse_error()
+    return err.domain == GLib.quark_to_string(Gst.ResourceError.quark())
+
+def _open_proc(path):
+    try:
+        return os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+
+# Kept open for the lifetime of the app; each tick is a single pread()
+_stat_fd = _open_proc('/proc/stat')
+_mem_fd = _open_proc('/proc/meminfo')
+
+def _meminfo_field(buf, key, default=0):
+    i = buf.find(key)
+    if i < 0:
+        return default
+    return int(buf[i + len(key):buf.find(b'\n', i + 1)].split()[0])
 
 def read_mem_percent():
     try:
-        meminfo = {}
-        with open('/proc/meminfo', 'r') as f:
-            for line in f:
-                key, val = line.split(':', 1)
-                meminfo[key.strip()] = int(val.strip().split()[0])
-        total = meminfo.get('MemTotal', 1)
-        free = meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0)
+        buf = os.pread(_mem_fd, 512, 0)
+        total = _meminfo_field(buf, b'MemTotal:') or 1
+        free = _meminfo_field(buf, b'\nMemAvailable:', None)
+        if free is None:
+            # Kernels before 3.14 have no MemAvailable
+            free = (_meminfo_field(buf, b'\nMemFree:') + _meminfo_field(buf, b'\nBuffers:')
+                    + _meminfo_field(buf, b'\nCached:'))
         used = max(0, total - free)
         return used * 100.0 / total
     except Exception:
         return 0.0
 
 def get_video_devices():
+    # Permission check only - opening a v4l2 node can power up the sensor
     devices = []
-    for device_path in glob.glob('/dev/video*'):
-        device_num = int(re.findall(r'\d+', device_path)[-1])
-        if device_num >= 2:
-            try:
-                with open(device_path, 'rb') as f:
-                    devices.append(device_path)
-            except (PermissionError, OSError):
-                pass
+    for entry in os.scandir('/dev'):
+        suffix = entry.name[5:]
+        if (entry.name.startswith('video') and suffix.isdigit() and int(suffix) >= 2
+                and os.access(entry.path, os.R_OK)):
+            devices.append(entry.path)
     return sorted(devices) if devices else ['/dev/video2']
 
-def get_device_formats(device_path):
+def get_device_formats(device_path, fd=None):
     try:
+        cache_key = _formats_cache_key(device_path)
+        cached = load_cached_formats(cache_key)
+        if cached is not None:
+            return cached
+
+        try:
+            # Reuse the caller's fd if it holds one open, otherwise open just for this query
+            own_fd = fd is None
+            if own_fd:
+                fd = v4l2_ioctl.open_device(device_path)
+            try:
+                formats = [(code, f"{code} ({desc})") for _, code, desc in v4l2_ioctl.enum_formats(fd)]
+            finally:
+                if own_fd:
+                    os.close(fd)
+            if formats:
+                store_cached_formats(cache_key, formats)
+                return formats
+            return [('MJPG', 'MJPG (Motion-JPEG)')]
+        except OSError:
+            pass  # ioctl path failed, parse v4l2-ctl text instead
+
         result = subprocess.run(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
                               capture_output=True, text=True, timeout=3)
         if result.returncode == 0:
@@ -78,7 +144,10 @@ def get_device_formats(device_path):
                 if match:
                     code, desc = match.group(2), match.group(3)
                     formats.append((code, f"{code} ({desc})"))
-            return formats if formats else [('MJPG', 'MJPG (Motion-JPEG)')]
+            if formats:
+                store_cached_formats(cache_key, formats)
+                return formats
+            return [('MJPG', 'MJPG (Motion-JPEG)')]
     except:
         pass
     return [('MJPG', 'MJPG (Motion-JPEG)'), ('YUYV', 'YUYV (YUV 4:2:2)')]
@@ -88,16 +157,30 @@ class CameraWindow(Gtk.Window):
         # EXACT same init pattern as working app
         super().__init__(type=Gtk.WindowType.TOPLEVEL)
         self.set_title("USB Camera Touch Viewer")
-        self.connect("destroy", Gtk.main_quit)
+        self.connect("destroy", self.on_destroy)
+
+        # Query fds stay open per device so format refreshes skip the driver open/release
+        self._fds = {}
 
         # Get devices first (before GStreamer)
         self.video_devices = get_video_devices()
         self.device = self.video_devices[0]
         self.current_format = 'MJPG'
-        self.available_formats = get_device_formats(self.device)
+        self.available_formats = get_device_formats(self.device, self._fd(self.device))
         self.width, self.height, self.fps = 640, 480, 30
         self.paused = False
         self.pipeline = None
+        self.pipeline_pending = False
+        # CPU usage: previous (total, idle) jiffies and the last few readings for smoothing
+        self._cpu_prev = (0.0, 0.0)
+        self._cpu_ring = collections.deque(maxlen=4)
+        # Single worker keeps parse_launch/state changes off the GTK main
+        # loop while preserving start/stop ordering
+        self.gst_worker = ThreadPoolExecutor(max_workers=1)
+        # Set on destroy; builds still queued or running then stop their own pipeline
+        self.closed = False
+        # Built pipeline posted to the main loop but not yet taken by _pipeline_ready
+        self.handoff = None
 
         self.res_options = [(320, 240), (640, 480), (800, 600), (1280, 720), (1920, 1080)]
 
@@ -175,7 +258,7 @@ class CameraWindow(Gtk.Window):
         controls.pack_start(self.start_btn, False, False, 0)
 
         self.exit_btn = Gtk.Button(label="Exit")
-        self.exit_btn.connect("clicked", lambda *_: Gtk.main_quit())
+        self.exit_btn.connect("clicked", lambda *_: self.destroy())
         controls.pack_start(self.exit_btn, False, False, 0)
 
         # Usage label
@@ -186,11 +269,35 @@ class CameraWindow(Gtk.Window):
         self.show_all()
         self.fullscreen()
 
+    def _fd(self, path):
+        fd = self._fds.get(path)
+        if fd is None:
+            try:
+                fd = v4l2_ioctl.open_device(path)
+            except OSError:
+                return None
+            self._fds[path] = fd
+        return fd
+
+    def on_destroy(self, *_):
+        # Queued stops still run; queued builds see closed and skip, a running
+        # one sets its own pipeline to NULL. Waiting frees the camera before exit.
+        self.closed = True
+        self.gst_worker.shutdown(wait=True)
+        for pipeline in (self.pipeline, self.handoff):
+            if pipeline:
+                pipeline.set_state(Gst.State.NULL)
+        self.pipeline = self.handoff = None
+        for fd in self._fds.values():
+            os.close(fd)
+        self._fds.clear()
+        Gtk.main_quit()
+
     def on_device_changed(self, combo):
         idx = combo.get_active()
         if idx >= 0:
             self.device = self.video_devices[idx]
-            self.available_formats = get_device_formats(self.device)
+            self.available_formats = get_device_formats(self.device, self._fd(self.device))
             self.format_combo.remove_all()
             for code, desc in self.available_formats:
                 self.format_combo.append_text(desc)
@@ -210,6 +317,8 @@ class CameraWindow(Gtk.Window):
         self.fps = int(scale.get_value())
 
     def on_start_stop(self, btn):
+        if self.pipeline_pending:
+            return
         if self.pipeline:
             self.stop_pipeline()
             self.start_btn.set_label("Start")
@@ -221,23 +330,75 @@ class CameraWindow(Gtk.Window):
         if self.pipeline:
             self.stop_pipeline()
 
-        try:
+        self.pipeline_pending = True
+        self.gst_worker.submit(self._build_worker, self.device)
+
+    def _build_worker(self, device):
+        """Runs on the GStreamer worker thread - camera open can take hundreds of ms"""
+        if self.closed:
+            return
+        pipeline = None
+        for io_mode in V4L2_IO_MODES:
             # Simple pipeline for testing
-            pipeline_str = f"v4l2src device={self.device} ! videoconvert ! autovideosink"
-            self.pipeline = Gst.parse_launch(pipeline_str)
-            self.pipeline.set_state(Gst.State.PLAYING)
-            print(f"Started pipeline: {pipeline_str}")
-        except Exception as e:
-            print(f"Pipeline error: {e}")
-            self.pipeline = None
+            pipeline_str = f"v4l2src device={device} io-mode={io_mode} ! videoconvert ! autovideosink"
+            try:
+                pipeline = Gst.parse_launch(pipeline_str)
+                pipeline.set_state(Gst.State.PLAYING)
+                msg = pipeline.get_bus().timed_pop_filtered(
+                    PREROLL_TIMEOUT * Gst.MSECOND,
+                    Gst.MessageType.ASYNC_DONE | Gst.MessageType.ERROR)
+                if is_resource_error(msg):
+                    print(f"io-mode={io_mode} not supported by {device}, retrying")
+                    pipeline.set_state(Gst.State.NULL)
+                    pipeline = None
+                    continue
+                print(f"Started pipeline: {pipeline_str}")
+            except Exception as e:
+                print(f"Pipeline error: {e}")
+                pipeline = None
+            break
+        if self.closed:
+            # The window is gone and _pipeline_ready would never run
+            if pipeline:
+                pipeline.set_state(Gst.State.NULL)
+            return
+        self.handoff = pipeline
+        GLib.idle_add(self._pipeline_ready, pipeline)
+
+    def _pipeline_ready(self, pipeline):
+        self.handoff = None
+        self.pipeline = pipeline
+        self.pipeline_pending = False
+        return False
 
     def stop_pipeline(self):
         if self.pipeline:
-            self.pipeline.set_state(Gst.State.NULL)
-            self.pipeline = None
+            pipeline, self.pipeline = self.pipeline, None
+            self.gst_worker.submit(pipeline.set_state, Gst.State.NULL)
+
+    def read_cpu_percent(self):
+        try:
+            buf = os.pread(_stat_fd, 256, 0)
+            line = buf[:buf.index(b'\n')]
+            parts = [float(x) for x in line.split()[1:8]]
+            user, nice, system, idle, iowait, irq, softirq = parts
+            idle_all = idle + iowait
+            non_idle = user + nice + system + irq + softirq
+            total = idle_all + non_idle
+            prev_total, prev_idle = self._cpu_prev
+            self._cpu_prev = (total, idle_all)
+            totald = total - prev_total
+            if prev_total and totald > 0:
+                raw = (totald - (idle_all - prev_idle)) * 100.0 / totald
+                self._cpu_ring.append(max(0.0, min(100.0, raw)))
+        except Exception:
+            pass
+        if not self._cpu_ring:
+            return 0.0
+        return sum(self._cpu_ring) / len(self._cpu_ring)
 
     def update_usage(self):
-        cpu = read_cpu_percent()
+        cpu = self.read_cpu_percent()
         mem = read_mem_percent()
         self.usage_label.set_text(f"CPU {cpu:.0f}% | RAM {mem:.0f}%")
         return True
@@ -2,11 +2,13 @@
 # complete_camera.py - Full featured camera app with all controls
 import gi
 import subprocess
-import glob
 import re
 import os
 import sys
-import time
+import json
+import atexit
+import threading
+import v4l2_ioctl
 
 gi.require_version("Gtk", "3.0")
 gi.require_version("Gst", "1.0")
@@ -17,70 +19,150 @@ Gdk.set_allowed_backends("wayland")
 _prev_total = 0
 _prev_idle = 0
 
+def _open_proc(path):
+    try:
+        return os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+
+# Kept open for the lifetime of the app; each sample is one preadv() into a
+# preallocated buffer, so the kernel fills it in a single read (no torn
+# snapshot) and a tick allocates no new read buffers
+_stat_fd = _open_proc('/proc/stat')
+_mem_fd = _open_proc('/proc/meminfo')
+_stat_buf = bytearray(256)
+_mem_buf = bytearray(8192)
+
+@atexit.register
+def _close_proc():
+    for fd in (_stat_fd, _mem_fd):
+        if fd is not None:
+            os.close(fd)
+
+def _read_cpu_times():
+    """(total, idle) jiffies from the aggregate cpu line"""
+    n = os.preadv(_stat_fd, [_stat_buf], 0)
+    line = _stat_buf[:_stat_buf.index(b'\n', 0, n)]
+    parts = [int(x) for x in line.split()[1:8]]
+    user, nice, system, idle, iowait, irq, softirq = parts
+    idle_all = idle + iowait
+    non_idle = user + nice + system + irq + softirq
+    return idle_all + non_idle, idle_all
+
+def _prime_cpu():
+    """Take the baseline sample so the first read_cpu_percent() is a real delta"""
+    global _prev_total, _prev_idle
+    try:
+        _prev_total, _prev_idle = _read_cpu_times()
+    except Exception:
+        pass
+
 def read_cpu_percent():
     global _prev_total, _prev_idle
     try:
-        with open('/proc/stat', 'r') as f:
-            line = f.readline()
-        parts = [float(x) for x in line.split()[1:8]]
-        user, nice, system, idle, iowait, irq, softirq = parts
-        idle_all = idle + iowait
-        non_idle = user + nice + system + irq + softirq
-        total = idle_all + non_idle
-        if _prev_total == 0:
-            _prev_total, _prev_idle = total, idle_all
-            return 0.0
+        total, idle_all = _read_cpu_times()
         totald = total - _prev_total
         idled = idle_all - _prev_idle
         _prev_total, _prev_idle = total, idle_all
         if totald <= 0:
-            return 0.0
-        return max(0.0, min(100.0, (totald - idled) * 100.0 / totald))
+            return 0
+        # Jiffies are integers; whole-percent integer math is all the label shows
+        return max(0, min(100, (totald - idled) * 100 // totald))
     except Exception:
-        return 0.0
+        return 0
+
+_MEMINFO_RE = re.compile(rb'^(MemAvailable|MemTotal|MemFree|Buffers|Cached):\s+(\d+)', re.M)
 
 def read_mem_percent():
     try:
-        meminfo = {}
-        with open('/proc/meminfo', 'r') as f:
-            for line in f:
-                key, val = line.split(':', 1)
-                meminfo[key.strip()] = int(val.strip().split()[0])
-        total = meminfo.get('MemTotal', 1)
-        free = meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0)
+        n = os.preadv(_mem_fd, [_mem_buf], 0)
+        meminfo = dict(_MEMINFO_RE.findall(_mem_buf, 0, n))
+        total = int(meminfo.get(b'MemTotal', 1))
+        if b'MemAvailable' in meminfo:
+            free = int(meminfo[b'MemAvailable'])
+        else:
+            # Kernels before 3.14 have no MemAvailable
+            free = int(meminfo.get(b'MemFree', 0)) + int(meminfo.get(b'Buffers', 0)) + int(meminfo.get(b'Cached', 0))
         used = max(0, total - free)
         return used * 100.0 / total
     except Exception:
         return 0.0
 
+_VIDEO_RE = re.compile(r'^video(\d+)$')
+
 def get_video_devices():
     devices = []
     try:
-        for device_path in glob.glob('/dev/video*'):
-            device_num = int(re.findall(r'\d+', device_path)[-1])
-            if device_num >= 2:  # Skip /dev/video0 and /dev/video1 (GPU modules)
-                try:
-                    with open(device_path, 'rb') as f:
-                        devices.append(device_path)
-                except:
-                    pass
+        # os.access instead of opening the node: an open can block while a camera initializes
+        for entry in os.scandir('/dev'):
+            match = _VIDEO_RE.match(entry.name)
+            # Skip /dev/video0 and /dev/video1 (GPU modules)
+            if match and int(match.group(1)) >= 2 and os.access(entry.path, os.R_OK):
+                devices.append(entry.path)
     except Exception as e:
         print(f"Device detection error: {e}")
     return sorted(devices) if devices else ['/dev/video2']
 
+# Formats only change when the device node is recreated (hot-plug), so
+# memoize them per (path, node mtime) and keep them across runs
+FORMAT_CACHE_FILE = os.path.expanduser('~/.cache/complete_camera/formats.json')
+_FORMAT_CACHE = None
+
+def _format_cache():
+    global _FORMAT_CACHE
+    if _FORMAT_CACHE is None:
+        try:
+            with open(FORMAT_CACHE_FILE, 'r') as f:
+                _FORMAT_CACHE = {key: [tuple(fmt) for fmt in formats] for key, formats in json.load(f).items()}
+        except (OSError, ValueError):
+            _FORMAT_CACHE = {}
+    return _FORMAT_CACHE
+
+def _format_cache_key(device_path):
+    return f"{device_path}:{os.stat(device_path).st_mtime_ns}"
+
+@atexit.register
+def save_format_cache():
+    if not _FORMAT_CACHE:
+        return
+    try:
+        os.makedirs(os.path.dirname(FORMAT_CACHE_FILE), exist_ok=True)
+        tmp_file = FORMAT_CACHE_FILE + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(_FORMAT_CACHE, f)
+        os.replace(tmp_file, FORMAT_CACHE_FILE)
+    except OSError:
+        pass
+
+_FMT_RE = re.compile(rb"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)")
+
 def get_device_formats(device_path):
     formats = []
     try:
-        result = subprocess.run(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
-                              capture_output=True, text=True, timeout=3)
-        if result.returncode == 0:
-            for line in result.stdout.split('\n'):
-                match = re.search(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)", line)
-                if match:
-                    code, desc = match.group(2), match.group(3)
+        cache_key = _format_cache_key(device_path)
+        cached = _format_cache().get(cache_key)
+        if cached:
+            return cached
+
+        try:
+            # VIDIOC_ENUM_FMT in-process; the fourcc is already the format code
+            fd = v4l2_ioctl.open_device(device_path)
+            try:
+                formats = [(code, f"{code} ({desc})") for _, code, desc in v4l2_ioctl.enum_formats(fd)]
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"VIDIOC_ENUM_FMT failed for {device_path}: {e}, trying v4l2-ctl")
+            result = subprocess.run(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=3)
+            if result.returncode == 0:
+                # Scan the raw bytes; only the matched fields get decoded
+                for match in _FMT_RE.finditer(result.stdout):
+                    code, desc = match.group(2).decode(), match.group(3).decode()
                     formats.append((code, f"{code} ({desc})"))
         if not formats:
             raise Exception("No formats detected")
+        _format_cache()[cache_key] = formats
     except Exception as e:
         print(f"Format detection failed for {device_path}: {e}")
         # Fallback to common formats
@@ -91,12 +173,106 @@ def get_device_formats(device_path):
         ]
     return formats
 
+# Decoders in order of preference: V4L2 M2M / VA-API hardware first, software last
+DECODERS = {
+    'MJPG': ('v4l2jpegdec', 'vaapijpegdec', 'jpegdec'),
+    'H264': ('v4l2h264dec', 'vaapih264dec', 'avdec_h264'),
+}
+_decoder_choice = {}
+
+# Don't keep a reference to the last frame; lets v4l2src recycle its buffers
+VIDEO_SINK = "waylandsink enable-last-sample=false"
+
+def _template_caps(element_name, direction):
+    factory = Gst.ElementFactory.find(element_name)
+    caps = Gst.Caps.new_empty()
+    for template in factory.get_static_pad_templates():
+        if template.direction == direction:
+            caps = caps.merge(template.get_caps())
+    return caps
+
+_display_caps = None
+# Decoders whose output the display refused at runtime; they always get videoconvert
+_needs_convert = set()
+
+def _display_sink_caps():
+    """Formats the compositor accepts, queried from waylandsink once it is connected (READY)"""
+    global _display_caps
+    if _display_caps is None:
+        # The sink pad template lists every format waylandsink knows, not what this display takes
+        _display_caps = Gst.Caps.new_empty()
+        sink = Gst.ElementFactory.make('waylandsink', None)
+        if sink is not None:
+            if sink.set_state(Gst.State.READY) != Gst.StateChangeReturn.FAILURE:
+                _display_caps = sink.get_static_pad('sink').query_caps(None)
+            sink.set_state(Gst.State.NULL)
+    return _display_caps
+
+def converter_for(decoder):
+    """'videoconvert ! ' unless a hardware decoder's output can go straight to the display"""
+    # Software decoders advertise every format they might emit (jpegdec can
+    # output Y42B etc.), so only hardware decoders are trusted to skip it
+    if decoder in _needs_convert or decoder in (candidates[-1] for candidates in DECODERS.values()):
+        return "videoconvert ! "
+    decoded = _template_caps(decoder, Gst.PadDirection.SRC)
+    return "" if decoded.can_intersect(_display_sink_caps()) else "videoconvert ! "
+
+def is_not_negotiated(err, debug):
+    """True for a caps negotiation failure, reported directly or as a stopped streaming thread"""
+    return (err.matches(Gst.StreamError.quark(), Gst.StreamError.NOT_NEGOTIATED)
+            or 'not-negotiated' in (debug or ''))
+
+def have_elements(*names):
+    return all(Gst.ElementFactory.find(name) for name in names)
+
+def _pick_decoder(fmt):
+    """First installed decoder for fmt (needs Gst.init)"""
+    if fmt not in _decoder_choice:
+        candidates = DECODERS[fmt]
+        _decoder_choice[fmt] = next((name for name in candidates if have_elements(name)), candidates[-1])
+    return _decoder_choice[fmt]
+
+_raw_display = None
+
+def _pick_raw_display():
+    """Display chain for raw frames: colorspace conversion off the CPU when possible"""
+    global _raw_display
+    if _raw_display is None:
+        # V4L2 M2M converter (DMABUF straight to the compositor), then GL, then software videoconvert
+        if have_elements('v4l2convert'):
+            _raw_display = f"v4l2convert ! {VIDEO_SINK}"
+        elif have_elements('glupload', 'glcolorconvert', 'glimagesink'):
+            _raw_display = "glupload ! glcolorconvert ! glimagesink"
+        else:
+            _raw_display = f"videoconvert ! {VIDEO_SINK}"
+    return _raw_display
+
 class CompleteCameraWindow(Gtk.Window):
+    # Caps per (format kind, framerate requested), specialized up front
+    _CAPS_TEMPLATES = {
+        ('MJPG', True): "image/jpeg,width={w},height={h},framerate={fps}/1",
+        ('MJPG', False): "image/jpeg,width={w},height={h}",
+        ('H264', True): "video/x-h264,width={w},height={h},framerate={fps}/1",
+        ('H264', False): "video/x-h264,width={w},height={h}",
+        ('RAW', True): "video/x-raw,format={fmt},width={w},height={h},framerate={fps}/1",
+        ('RAW', False): "video/x-raw,format={fmt},width={w},height={h}",
+    }
+    # Full pipeline per format kind. io-mode=4: v4l2src exports its capture
+    # buffers as DMABUF; the named capsfilter lets Apply change size/rate in place
+    _PIPELINE_TEMPLATES = {
+        'MJPG': 'v4l2src device={dev} io-mode=4 ! capsfilter name=cf caps="{caps}" ! {decoder} ! {convert}{sink}',
+        'H264': 'v4l2src device={dev} io-mode=4 ! capsfilter name=cf caps="{caps}" ! h264parse ! {decoder} ! {convert}{sink}',
+        'RAW': 'v4l2src device={dev} io-mode=4 ! capsfilter name=cf caps="{caps}" ! {display}',
+    }
+    _FALLBACK_TEMPLATE = "v4l2src device={dev} ! videoconvert ! {sink}"
+    # Raw formats: GStreamer format name for each V4L2 code (anything else is YUY2)
+    _RAW_FORMATS = {'YUYV': 'YUY2', 'YUV420': 'I420', 'UYVY': 'UYVY'}
+
     def __init__(self):
         try:
             super().__init__(type=Gtk.WindowType.TOPLEVEL)
             self.set_title("USB Camera Touch Viewer")
-            self.connect("destroy", Gtk.main_quit)
+            self.connect("destroy", self.on_destroy)
 
             print("Initializing camera application...")
 
@@ -107,8 +283,25 @@ class CompleteCameraWindow(Gtk.Window):
             self.current_format = self.available_formats[0][0]
             self.width, self.height, self.fps = 640, 480, 30
             self.pipeline = None
+            self.pipeline_key = None  # (device, format) the pipeline was built for
+            self.unconverted_decoder = None  # decoder linked straight to the sink, if any
+            self.fallback_active = False
+            self.bus = None
             self.is_running = False
 
+            # System monitor: sampled on a background thread (CPU every second,
+            # RAM every 5 s) only while the window is mapped
+            self._monitor_thread = None
+            self._monitor_visible = threading.Event()
+            self._monitor_stop = threading.Event()
+            self._last_cpu = 0
+            self._last_mem = 0.0
+            self._last_usage_text = ''
+
+            # Pending debounce timers for the resolution/FPS controls
+            self._res_timer = None
+            self._fps_timer = None
+
             self.res_options = [
                 (320, 240), (640, 480), (800, 600), (1280, 720),
                 (1280, 800), (1366, 768), (1600, 900), (1920, 1080)
@@ -224,18 +417,19 @@ class CompleteCameraWindow(Gtk.Window):
 
             self.exit_btn = Gtk.Button(label="Exit")
             self.exit_btn.set_size_request(80, 40)
-            self.exit_btn.connect("clicked", lambda *_: Gtk.main_quit())
+            self.exit_btn.connect("clicked", lambda *_: self.destroy())
             button_box.pack_start(self.exit_btn, False, False, 0)
 
+            # Start system monitoring when shown, stop when hidden
+            self.connect("map", self.start_monitor)
+            self.connect("unmap", self.stop_monitor)
+
             self.show_all()
             self.fullscreen()
 
             # Initialize GStreamer after window is shown
             GLib.timeout_add(500, self.init_gstreamer)
 
-            # Start system monitoring
-            GLib.timeout_add(1000, self.update_usage)
-
         except Exception as e:
             print(f"UI setup error: {e}")
             sys.exit(1)
@@ -276,11 +470,26 @@ class CompleteCameraWindow(Gtk.Window):
         idx = combo.get_active()
         if idx >= 0:
             self.width, self.height = self.res_options[idx]
-            print(f"Resolution changed to: {self.width}x{self.height}")
+            if self._res_timer:
+                GLib.source_remove(self._res_timer)
+            self._res_timer = GLib.timeout_add(250, self._commit_resolution)
+
+    def _commit_resolution(self):
+        self._res_timer = None
+        print(f"Resolution changed to: {self.width}x{self.height}")
+        return False
 
     def on_fps_changed(self, scale):
+        # The slider fires on every step of a drag; only report where it settles
         self.fps = int(scale.get_value())
+        if self._fps_timer:
+            GLib.source_remove(self._fps_timer)
+        self._fps_timer = GLib.timeout_add(250, self._commit_fps)
+
+    def _commit_fps(self):
+        self._fps_timer = None
         print(f"FPS changed to: {self.fps}")
+        return False
 
     def on_start_stop(self, btn):
         if self.is_running:
@@ -289,12 +498,40 @@ class CompleteCameraWindow(Gtk.Window):
             self.start_camera()
 
     def on_apply(self, btn):
-        if self.is_running:
+        if not self.is_running:
+            return
+
+        capsfilter = self.pipeline.get_by_name('cf') if self.pipeline else None
+        if capsfilter and self.fps > 0 and self.pipeline_key == (self.device, self.current_format):
+            # Same device and format: renegotiate the running pipeline in place
+            caps = self.current_caps()
+            print(f"Applying caps: {caps}")
+            capsfilter.set_property('caps', Gst.Caps.from_string(caps))
+            self.set_run_state()
+        else:
             self.stop_camera()
             self.start_camera()
 
+    def format_kind(self):
+        """'MJPG', 'H264' or 'RAW' (YUYV, etc.)"""
+        return self.current_format if self.current_format in ('MJPG', 'H264') else 'RAW'
+
+    def current_caps(self):
+        """Caps for the selected format, resolution and frame rate"""
+        return self._CAPS_TEMPLATES[(self.format_kind(), self.fps > 0)].format(
+            w=self.width, h=self.height, fps=self.fps, fmt=self._RAW_FORMATS.get(self.current_format, 'YUY2'))
+
+    def set_run_state(self):
+        ret = self.pipeline.set_state(Gst.State.PLAYING)
+        # Already playing (in-place Apply) won't post a state change; otherwise _on_bus_state reports it
+        self.status_label.set_text("Camera running" if ret == Gst.StateChangeReturn.SUCCESS else "Starting camera...")
+        self.pause_btn.set_label("Pause")
+
     def on_pause(self, btn):
         if not self.pipeline:
+            if self.is_running:
+                # Idle at 0 FPS: Resume builds the pipeline now
+                self.start_camera(resume=True)
             return
 
         if btn.get_label() == "Pause":
@@ -306,70 +543,114 @@ class CompleteCameraWindow(Gtk.Window):
             btn.set_label("Pause")
             self.status_label.set_text("Camera running")
 
-    def start_camera(self):
+    def start_camera(self, resume=False):
         try:
             if self.pipeline:
                 self.stop_camera()
 
+            if self.fps == 0 and not resume:
+                # 0 FPS: don't open the camera at all, so no USB traffic and no decoding
+                self.is_running = True
+                self.pipeline_key = None
+                self.start_btn.set_label("Stop Camera")
+                self.pause_btn.set_label("Resume")
+                self.pause_btn.set_sensitive(True)
+                self.status_label.set_text("Camera idle (0 FPS)")
+                print("Camera idle at 0 FPS, no pipeline started")
+                return
+
             # Build pipeline based on format and settings
-            if self.current_format == 'MJPG':
-                if self.fps > 0:
-                    caps = f"image/jpeg,width={self.width},height={self.height},framerate={self.fps}/1"
-                else:
-                    caps = f"image/jpeg,width={self.width},height={self.height}"
-                pipeline_str = f"v4l2src device={self.device} ! {caps} ! jpegdec ! videoconvert ! waylandsink"
-            elif self.current_format == 'H264':
-                if self.fps > 0:
-                    caps = f"video/x-h264,width={self.width},height={self.height},framerate={self.fps}/1"
-                else:
-                    caps = f"video/x-h264,width={self.width},height={self.height}"
-                pipeline_str = f"v4l2src device={self.device} ! {caps} ! h264parse ! avdec_h264 ! videoconvert ! waylandsink"
+            kind = self.format_kind()
+            fields = {'dev': self.device, 'caps': self.current_caps(), 'sink': VIDEO_SINK}
+            self.unconverted_decoder = None
+            if kind == 'RAW':
+                fields['display'] = _pick_raw_display()
             else:
-                # Raw formats (YUYV, etc.)
-                format_map = {'YUYV': 'YUY2', 'YUV420': 'I420', 'UYVY': 'UYVY'}
-                gst_format = format_map.get(self.current_format, 'YUY2')
-                if self.fps > 0:
-                    caps = f"video/x-raw,format={gst_format},width={self.width},height={self.height},framerate={self.fps}/1"
-                else:
-                    caps = f"video/x-raw,format={gst_format},width={self.width},height={self.height}"
-                pipeline_str = f"v4l2src device={self.device} ! {caps} ! videoconvert ! waylandsink"
+                fields['decoder'] = decoder = _pick_decoder(kind)
+                fields['convert'] = converter_for(decoder)
+                if not fields['convert']:
+                    self.unconverted_decoder = decoder
+            pipeline_str = self._PIPELINE_TEMPLATES[kind].format(**fields)
 
             print(f"Starting pipeline: {pipeline_str}")
             self.pipeline = Gst.parse_launch(pipeline_str)
-
-            if self.fps == 0:
-                self.pipeline.set_state(Gst.State.PAUSED)
-                self.status_label.set_text("Camera paused (0 FPS)")
-                self.pause_btn.set_label("Resume")
-            else:
-                self.pipeline.set_state(Gst.State.PLAYING)
-                self.status_label.set_text("Camera running")
-                self.pause_btn.set_label("Pause")
+            self.pipeline_key = (self.device, self.current_format)
+            self.fallback_active = False
+            # Negotiation/device errors arrive on the bus; _on_bus_error switches to the fallback
+            self.watch_bus()
+            self.set_run_state()
 
             self.is_running = True
             self.start_btn.set_label("Stop Camera")
             self.pause_btn.set_sensitive(True)
-            print("Camera started successfully")
+            print("Camera pipeline starting")
 
         except Exception as e:
             print(f"Camera start error: {e}")
             self.status_label.set_text(f"Camera error: {e}")
-            # Try fallback pipeline
-            try:
-                simple_pipeline = f"v4l2src device={self.device} ! videoconvert ! waylandsink"
-                self.pipeline = Gst.parse_launch(simple_pipeline)
-                self.pipeline.set_state(Gst.State.PLAYING)
-                self.is_running = True
-                self.start_btn.set_label("Stop Camera")
-                self.pause_btn.set_sensitive(True)
-                self.status_label.set_text("Camera running (fallback mode)")
-                print(f"Fallback pipeline started: {simple_pipeline}")
-            except Exception as e2:
-                print(f"Fallback failed: {e2}")
-                self.status_label.set_text(f"Camera failed: {e2}")
+            self.start_fallback()
+
+    def start_fallback(self):
+        if self.pipeline:
+            self.unwatch_bus()
+            self.pipeline.set_state(Gst.State.NULL)
+            self.pipeline = None
+        try:
+            simple_pipeline = self._FALLBACK_TEMPLATE.format(dev=self.device, sink=VIDEO_SINK)
+            self.pipeline = Gst.parse_launch(simple_pipeline)
+            self.pipeline_key = None
+            self.fallback_active = True
+            self.watch_bus()
+            self.pipeline.set_state(Gst.State.PLAYING)
+            self.is_running = True
+            self.start_btn.set_label("Stop Camera")
+            self.pause_btn.set_sensitive(True)
+            self.status_label.set_text("Starting camera (fallback mode)")
+            print(f"Fallback pipeline starting: {simple_pipeline}")
+        except Exception as e2:
+            print(f"Fallback failed: {e2}")
+            self.status_label.set_text(f"Camera failed: {e2}")
+
+    def watch_bus(self):
+        self.bus = self.pipeline.get_bus()
+        self.bus.add_signal_watch()
+        self.bus.connect('message::error', self._on_bus_error)
+        self.bus.connect('message::state-changed', self._on_bus_state)
+
+    def unwatch_bus(self):
+        if self.bus:
+            self.bus.remove_signal_watch()
+            self.bus = None
+
+    def _on_bus_error(self, bus, msg):
+        if bus is not self.bus:
+            return  # late message from a pipeline we already replaced
+        err, debug = msg.parse_error()
+        print(f"Pipeline error from {msg.src.get_name()}: {err.message}")
+        if not self.fallback_active and self.unconverted_decoder and is_not_negotiated(err, debug):
+            # The display refused the decoder's output after all; same pipeline, with videoconvert
+            print(f"{self.unconverted_decoder} output not accepted by the display, adding videoconvert")
+            _needs_convert.add(self.unconverted_decoder)
+            # A 0 FPS camera only has a pipeline after the user resumed it
+            self.start_camera(resume=self.fps == 0)
+        elif self.fallback_active:
+            self.stop_camera()
+            self.status_label.set_text(f"Camera failed: {err.message}")
+        else:
+            self.status_label.set_text(f"Camera error: {err.message}")
+            self.start_fallback()
+
+    def _on_bus_state(self, bus, msg):
+        if bus is not self.bus or msg.src is not self.pipeline:
+            return
+        _, new_state, _ = msg.parse_state_changed()
+        if new_state == Gst.State.PLAYING:
+            self.status_label.set_text("Camera running (fallback mode)" if self.fallback_active else "Camera running")
+            print("Camera started successfully")
 
     def stop_camera(self):
         if self.pipeline:
+            self.unwatch_bus()
             self.pipeline.set_state(Gst.State.NULL)
             self.pipeline = None
 
@@ -380,11 +661,50 @@ class CompleteCameraWindow(Gtk.Window):
         self.status_label.set_text("Camera stopped")
         print("Camera stopped")
 
+    def start_monitor(self, *_):
+        self._monitor_visible.set()
+        if self._monitor_thread is None:
+            self._monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
+            self._monitor_thread.start()
+
+    def stop_monitor(self, *_):
+        self._monitor_visible.clear()
+
+    def on_destroy(self, *_):
+        self._monitor_stop.set()
+        self._monitor_visible.set()  # wake the thread if it's parked while unmapped
+        Gtk.main_quit()
+
+    def _monitor_loop(self):
+        """procfs sampling off the GTK thread; results are handed back with idle_add"""
+        tick = 0
+        while not self._monitor_stop.is_set():
+            if not self._monitor_visible.is_set():
+                self._monitor_visible.wait()
+                tick = 0
+            if tick == 0:
+                _prime_cpu()
+                GLib.idle_add(self._apply_usage, None, read_mem_percent())
+            if self._monitor_stop.wait(1.0):
+                break
+            tick += 1
+            mem = read_mem_percent() if tick % 5 == 0 else None
+            GLib.idle_add(self._apply_usage, read_cpu_percent(), mem)
+
+    def _apply_usage(self, cpu, mem):
+        if cpu is not None:
+            self._last_cpu = cpu
+        if mem is not None:
+            self._last_mem = mem
+        self.update_usage()
+        return False
+
     def update_usage(self):
-        cpu = read_cpu_percent()
-        mem = read_mem_percent()
-        self.usage_label.set_text(f"CPU: {cpu:.0f}% | RAM: {mem:.0f}%")
-        return True
+        # Rounded values rarely change at idle; skip the relayout/redraw when they don't
+        text = f"CPU: {self._last_cpu:d}% | RAM: {self._last_mem:.0f}%"
+        if text != self._last_usage_text:
+            self.usage_label.set_text(text)
+            self._last_usage_text = text
 
 if __name__ == "__main__":
     try:
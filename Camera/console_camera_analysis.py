@@ -3,46 +3,42 @@
 
 import os
 import sys
-import glob
+import stat
 import subprocess
 import time
 import re
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Check if required modules are available
-try:
-    import pandas as pd
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-    from openpyxl.utils import get_column_letter
-except ImportError as e:
-    print(f"Required module missing: {e}")
-    print("Please install required modules:")
-    print("pip install pandas openpyxl")
-    sys.exit(1)
-
-try:
-    import gi
-    gi.require_version("Gst", "1.0")
-    from gi.repository import Gst, GLib
-except ImportError as e:
-    print(f"Required module missing: {e}")
-    print("GStreamer python bindings required")
-    sys.exit(1)
+# GStreamer and openpyxl are imported on first use (see _lazy_gst/_lazy_xlsx)
+# so the menu comes up without paying their import cost
+Gst = None
+GLib = None
+
+# v4l2-ctl --list-formats-ext line patterns
+_FORMAT_RE = re.compile(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)")
+_SIZE_RE = re.compile(r"Size:\s+Discrete\s+(\d+)x(\d+)")
+_INTERVAL_RE = re.compile(r"Interval:\s+Discrete\s+[\d.]+s\s+\(([\d.]+)\s+fps\)")
 
 class ConsoleCameraAnalyzer:
+    # Progress bar is a 40-char window into this, sliced by the filled length
+    _BAR_TEMPLATE = "█" * 40 + "░" * 40
+
+    # Recording caps per format; anything that isn't H264/MJPG is recorded as YUYV
+    _CAPS_TEMPLATES = {
+        'H264': "video/x-h264,width={w},height={h},framerate={fps:.0f}/1",
+        'MJPG': "image/jpeg,width={w},height={h},framerate={fps:.0f}/1",
+        'YUYV': "video/x-raw,format=YUY2,width={w},height={h},framerate={fps:.0f}/1",
+    }
+
     def __init__(self):
         print("🎥 Console Camera Analysis Tool")
         print("=" * 50)
 
-        # Initialize GStreamer
-        Gst.init(None)
-
         # Analysis settings
         self.recording_duration = 15  # seconds
         self.wait_duration = 16  # seconds
-        self.temp_dir = "/var/rootdirs/media/6333-3730"  # SD card storage
         self.output_excel = self.get_output_filename()  # Interactive filename selection
 
         # Analysis state
@@ -50,25 +46,58 @@ class ConsoleCameraAnalyzer:
         self.analysis_results = {}
         self.current_test = {}
         self.total_combinations = 0
+        self._test_plan = []
         self.completed_combinations = 0
         self.is_analyzing = False
+        self._done = threading.Event()  # set by complete_analysis
+        self._last_progress_key = None  # state of the last progress line drawn
         self.is_recording = False
         self.pipeline = None
+        self._pipeline_group = None  # (device_path, format) the pipeline was built for
+        self._h264_enc = 'x264enc'  # probed in start_complete_analysis
+        self._format_cfg = {}  # built in start_complete_analysis
+        self._finish_timer = None  # wait_duration timer for the running test
+        self._eos_timer = None  # fallback in case EOS never arrives
         self.main_loop = None
+        self._byte_count = 0  # muxer output bytes of the running test
 
         # Find video devices and their capabilities
         print("\n🔍 Scanning video devices for capabilities...")
         self.get_real_device_capabilities()
-        self.create_temp_directory()
 
         if self.total_combinations == 0:
             print("❌ No video devices found with usable capabilities!")
             sys.exit(1)
 
         print(f"\n✅ Ready to analyze {self.total_combinations} combinations")
-        print(f"💾 Video files saved to: {self.temp_dir}")
         print(f"📊 Output Excel: {self.output_excel}")
 
+    def _lazy_gst(self):
+        """Import and initialize GStreamer on first use; False if unavailable"""
+        global Gst, GLib
+        if Gst is None:
+            try:
+                import gi
+                gi.require_version("Gst", "1.0")
+                from gi.repository import Gst, GLib
+            except (ImportError, ValueError) as e:
+                print(f"Required module missing: {e}")
+                print("GStreamer python bindings required")
+                return False
+            Gst.init(None)
+        return True
+
+    def _lazy_xlsx(self):
+        """Import openpyxl on first use; False if unavailable"""
+        try:
+            import openpyxl
+        except ImportError as e:
+            print(f"Required module missing: {e}")
+            print("Please install required modules:")
+            print("pip install openpyxl")
+            return False
+        return True
+
     def get_output_filename(self):
         """Get Excel output filename with interactive editing"""
         print("\n" + "=" * 50)
@@ -172,52 +201,56 @@ class ConsoleCameraAnalyzer:
     def parse_v4l2_output(self, device_path):
         """Parse v4l2-ctl output to extract real device capabilities"""
         try:
-            result = subprocess.run(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
-                                  capture_output=True, text=True, timeout=5)
-
-            if result.returncode != 0 or not result.stdout.strip():
-                return {}
+            # Parse lines as v4l2-ctl prints them instead of buffering the whole output
+            proc = subprocess.Popen(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, bufsize=-1)
+            # Reading stdout blocks until the child exits, so the 5 s bound has to kill it
+            killer = threading.Timer(5, proc.kill)
+            killer.start()
 
             capabilities = {}
             current_format = None
+            current_resolution = None
 
-            lines = result.stdout.split('\n')
-
-            for line in lines:
-                line = line.strip()
-
-                # Look for format lines
-                format_match = re.search(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)", line)
-                if format_match:
-                    format_code = format_match.group(2)
-                    format_desc = format_match.group(3)
-                    current_format = format_code
-                    capabilities[current_format] = {
-                        'description': format_desc,
-                        'resolutions': {}
-                    }
-                    continue
-
-                # Look for size lines
-                size_match = re.search(r"Size:\s+Discrete\s+(\d+)x(\d+)", line)
-                if size_match and current_format:
-                    width = int(size_match.group(1))
-                    height = int(size_match.group(2))
-                    resolution = (width, height)
-
-                    if resolution not in capabilities[current_format]['resolutions']:
-                        capabilities[current_format]['resolutions'][resolution] = []
-                    continue
-
-                # Look for interval lines
-                interval_match = re.search(r"Interval:\s+Discrete\s+[\d.]+s\s+\(([\d.]+)\s+fps\)", line)
-                if interval_match and current_format:
-                    fps = float(interval_match.group(1))
-                    # Add this fps to the last resolution found
-                    resolutions = capabilities[current_format]['resolutions']
-                    if resolutions:
-                        last_resolution = list(resolutions.keys())[-1]
-                        capabilities[current_format]['resolutions'][last_resolution].append(fps)
+            try:
+                with proc:
+                    for line in proc.stdout:
+                        # Patterns are anchored at the start only, so trailing whitespace can stay
+                        line = line.lstrip()
+
+                        # Each line matches at most one pattern, picked by its leading keyword
+                        if line.startswith('['):
+                            format_match = _FORMAT_RE.match(line)
+                            if format_match:
+                                format_code = format_match.group(2)
+                                format_desc = format_match.group(3)
+                                current_format = format_code
+                                current_resolution = None
+                                capabilities[current_format] = {
+                                    'description': format_desc,
+                                    'resolutions': {}
+                                }
+
+                        elif line.startswith('Size:'):
+                            size_match = _SIZE_RE.match(line)
+                            if size_match and current_format:
+                                width = int(size_match.group(1))
+                                height = int(size_match.group(2))
+                                current_resolution = (width, height)
+                                capabilities[current_format]['resolutions'].setdefault(current_resolution, [])
+
+                        elif line.startswith('Interval:'):
+                            interval_match = _INTERVAL_RE.match(line)
+                            if interval_match and current_resolution:
+                                fps = float(interval_match.group(1))
+                                # Add this fps to the last resolution found
+                                capabilities[current_format]['resolutions'][current_resolution].append(fps)
+            finally:
+                killer.cancel()
+
+            # A killed (timed out) child reports a negative return code
+            if proc.returncode != 0:
+                return {}
 
             return capabilities
 
@@ -227,10 +260,22 @@ class ConsoleCameraAnalyzer:
 
     def get_real_device_capabilities(self):
         """Get video devices and their REAL capabilities from v4l2-ctl"""
-        for device_path in glob.glob('/dev/video*'):
+        # videoN character devices only, so non-capture nodes never reach v4l2-ctl
+        with os.scandir('/dev') as entries:
+            device_paths = sorted(entry.path for entry in entries
+                                  if entry.name.startswith('video') and entry.name[5:].isdigit()
+                                  and stat.S_ISCHR(entry.stat(follow_symlinks=False).st_mode))
+        for device_path in device_paths:
+            print(f"   Checking {device_path}...")
+
+        # Probes are just v4l2-ctl subprocess waits, so run them side by side;
+        # results are still reported in device order
+        with ThreadPoolExecutor(max_workers=min(16, len(device_paths) or 1)) as executor:
+            probes = [executor.submit(self.parse_v4l2_output, device_path) for device_path in device_paths]
+
+        for device_path, probe in zip(device_paths, probes):
             try:
-                print(f"   Checking {device_path}...")
-                capabilities = self.parse_v4l2_output(device_path)
+                capabilities = probe.result()
 
                 if capabilities:
                     device_info = {
@@ -238,12 +283,6 @@ class ConsoleCameraAnalyzer:
                         'capabilities': capabilities
                     }
                     self.video_devices.append(device_info)
-
-                    # Count total combinations
-                    for format_name, format_data in capabilities.items():
-                        for resolution, fps_list in format_data['resolutions'].items():
-                            self.total_combinations += len(fps_list)
-
                     print(f"   ✅ {device_path}: {len(capabilities)} formats")
                 else:
                     print(f"   ❌ {device_path}: No usable formats")
@@ -252,23 +291,30 @@ class ConsoleCameraAnalyzer:
                 print(f"   ⚠️  Error checking {device_path}: {e}")
                 continue
 
+        # Flat test order, indexed by completed_combinations
+        self._test_plan = [
+            {
+                'device_path': device_info['path'],
+                'format': format_name,
+                'resolution': resolution,
+                'fps': fps,
+                'caps': self.recording_caps(format_name, resolution, fps)
+            }
+            for device_info in self.video_devices
+            for format_name, format_data in device_info['capabilities'].items()
+            for resolution, fps_list in format_data['resolutions'].items()
+            for fps in sorted(fps_list)
+        ]
+        self.total_combinations = len(self._test_plan)
+
         print(f"\n📊 Found {len(self.video_devices)} usable video devices")
         print(f"🎯 Total combinations to test: {self.total_combinations}")
 
-    def create_temp_directory(self):
-        """Ensure SD card directory exists for video storage"""
-        try:
-            if not os.path.exists(self.temp_dir):
-                os.makedirs(self.temp_dir)
-                print(f"📁 Created video storage directory: {self.temp_dir}")
-            else:
-                print(f"📁 Using existing video storage directory: {self.temp_dir}")
-        except Exception as e:
-            print(f"❌ Error accessing SD card directory: {e}")
-            print(f"⚠️  Falling back to local storage")
-            self.temp_dir = "temp_analysis"
-            if not os.path.exists(self.temp_dir):
-                os.makedirs(self.temp_dir)
+    def recording_caps(self, format_name, resolution, fps):
+        """Caps string for recording one format/resolution/fps combination"""
+        w, h = resolution
+        template = self._CAPS_TEMPLATES.get(format_name, self._CAPS_TEMPLATES['YUYV'])
+        return template.format(w=w, h=h, fps=fps)
 
     def show_device_summary(self):
         """Show a summary of detected devices"""
@@ -293,13 +339,36 @@ class ConsoleCameraAnalyzer:
 
     def start_complete_analysis(self):
         """Start the complete automated analysis"""
+        # Check openpyxl up front too, so a missing module doesn't surface only after recording
+        if not self._lazy_gst() or not self._lazy_xlsx():
+            return False
+
+        # YUYV is encoded to H.264 for storage; prefer a hardware encoder over x264
+        if Gst.ElementFactory.find('v4l2h264enc'):
+            self._h264_enc = 'v4l2h264enc'
+        elif Gst.ElementFactory.find('omxh264enc'):
+            self._h264_enc = 'omxh264enc'
+        else:
+            self._h264_enc = 'x264enc tune=zerolatency speed-preset=ultrafast'
+
+        # Elements between the capsfilter and the sink, per format
+        self._format_cfg = {
+            'H264': 'h264parse ! mp4mux',
+            'MJPG': 'avimux',
+            'YUYV': f'videoconvert ! {self._h264_enc} ! h264parse ! avimux',
+        }
+
+        # Parse every test's caps once up front rather than per test
+        for test in self._test_plan:
+            test['caps_obj'] = Gst.Caps.from_string(test['caps'])
+
         print("\n" + "=" * 50)
         print("🚀 STARTING COMPLETE ANALYSIS")
         print("=" * 50)
 
         estimated_time = self.total_combinations * self.wait_duration
         print(f"⏱️  Estimated time: {estimated_time} seconds ({estimated_time // 60} minutes)")
-        print(f"📝 Process: Record 15s → Wait 16s → Measure → Delete → Repeat")
+        print(f"📝 Process: Record 15s → Wait 16s → Measure → Repeat")
         print()
 
         # Confirm start
@@ -313,6 +382,8 @@ class ConsoleCameraAnalyzer:
             return False
 
         self.is_analyzing = True
+        self._done.clear()
+        self._last_progress_key = None
         self.completed_combinations = 0
         self.analysis_results = {}
 
@@ -323,12 +394,11 @@ class ConsoleCameraAnalyzer:
         loop_thread.start()
 
         # Start the first test
-        GLib.timeout_add(100, self.run_next_test)
+        GLib.idle_add(self.run_next_test)
 
-        # Keep main thread alive and show progress
+        # Keep main thread alive and show progress; wakes immediately once the analysis is done
         try:
-            while self.is_analyzing:
-                time.sleep(1)
+            while not self._done.wait(1.0):
                 self.show_progress()
         except KeyboardInterrupt:
             print("\n🛑 Analysis interrupted by user")
@@ -344,11 +414,17 @@ class ConsoleCameraAnalyzer:
         if not self.is_analyzing:
             return
 
+        # Only redraw when the count or the running test changed
+        key = (self.completed_combinations, self.is_recording, id(self.current_test))
+        if key == self._last_progress_key:
+            return
+        self._last_progress_key = key
+
         progress_pct = (self.completed_combinations / self.total_combinations) * 100 if self.total_combinations > 0 else 0
         progress_bar_length = 40
         filled_length = int(progress_bar_length * progress_pct / 100)
 
-        bar = "█" * filled_length + "░" * (progress_bar_length - filled_length)
+        bar = self._BAR_TEMPLATE[progress_bar_length - filled_length:2 * progress_bar_length - filled_length]
 
         # Show progress and current test on same line
         current_test_info = ""
@@ -380,7 +456,7 @@ class ConsoleCameraAnalyzer:
             self.complete_analysis()
             return False
 
-        self.current_test = next_test
+        self.current_test = dict(next_test)  # per-run fields are added to this copy, not the plan
         device_path = next_test['device_path']
         format_name = next_test['format']
         resolution = next_test['resolution']
@@ -396,24 +472,8 @@ class ConsoleCameraAnalyzer:
 
     def get_next_test_combination(self):
         """Get the next combination to test"""
-        current_index = 0
-
-        for device_info in self.video_devices:
-            device_path = device_info['path']
-            capabilities = device_info['capabilities']
-
-            for format_name, format_data in capabilities.items():
-                for resolution, fps_list in format_data['resolutions'].items():
-                    for fps in sorted(fps_list):
-                        if current_index == self.completed_combinations:
-                            return {
-                                'device_path': device_path,
-                                'format': format_name,
-                                'resolution': resolution,
-                                'fps': fps
-                            }
-                        current_index += 1
-
+        if self.completed_combinations < len(self._test_plan):
+            return self._test_plan[self.completed_combinations]
         return None  # No more combinations
 
     def record_test_video(self):
@@ -421,99 +481,136 @@ class ConsoleCameraAnalyzer:
         try:
             device_path = self.current_test['device_path']
             format_name = self.current_test['format']
-            resolution = self.current_test['resolution']
-            fps = self.current_test['fps']
-
-            w, h = resolution
 
-            # Generate temp filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            if format_name == 'H264':
-                ext = 'mp4'
-            else:
-                ext = 'avi'
+            # One pipeline per device/format group; tests in the group only swap caps
+            group = (device_path, format_name)
+            if self.pipeline is None or self._pipeline_group != group:
+                self.stop_pipeline()
 
-            filename = f"test_{format_name}_{w}x{h}_{fps:.0f}fps_{timestamp}.{ext}"
-            output_file = os.path.join(self.temp_dir, filename)
+                body = self._format_cfg.get(format_name, self._format_cfg['YUYV'])
+                pipeline_str = f"v4l2src device={device_path} ! capsfilter name=capsfilter0 ! {body} ! fakesink name=sink0 sync=false"
 
-            # Build recording pipeline
-            if format_name == 'H264':
-                caps = f"video/x-h264,width={w},height={h},framerate={fps:.0f}/1"
-                pipeline_str = f"v4l2src device={device_path} ! {caps} ! h264parse ! mp4mux ! filesink location={output_file}"
+                self.pipeline = Gst.parse_launch(pipeline_str)
+                self._pipeline_group = group
 
-            elif format_name == 'MJPG':
-                caps = f"image/jpeg,width={w},height={h},framerate={fps:.0f}/1"
-                pipeline_str = f"v4l2src device={device_path} ! {caps} ! avimux ! filesink location={output_file}"
+                # EOS means the muxer has flushed the file; errors end the test early
+                bus = self.pipeline.get_bus()
+                bus.add_signal_watch()
+                bus.connect('message::eos', self._on_eos)
+                bus.connect('message::error', self._on_err)
 
-            else:  # YUYV
-                caps = f"video/x-raw,format=YUY2,width={w},height={h},framerate={fps:.0f}/1"
-                pipeline_str = f"v4l2src device={device_path} ! {caps} ! videoconvert ! x264enc ! avimux ! filesink location={output_file}"
+                # Count what the muxer would have written instead of writing it to storage
+                sink_pad = self.pipeline.get_by_name('sink0').get_static_pad('sink')
+                sink_pad.add_probe(Gst.PadProbeType.BUFFER, self._count_bytes)
 
-            # Try to create and start pipeline
-            self.pipeline = Gst.parse_launch(pipeline_str)
+            # Caps can only change while stopped (NULL or READY)
+            self.pipeline.get_by_name('capsfilter0').set_property('caps', self.current_test['caps_obj'])
+            self._byte_count = 0
             ret = self.pipeline.set_state(Gst.State.PLAYING)
 
             self.is_recording = True
-            self.current_test['output_file'] = output_file
             self.current_test['record_start'] = time.time()
 
             # Schedule finish after wait_duration
-            GLib.timeout_add(self.wait_duration * 1000, self.finish_test_recording)
+            self._finish_timer = GLib.timeout_add(self.wait_duration * 1000, self.finish_test_recording)
 
         except Exception as e:
             print(f"❌ Recording error: {e}")
             # Simple cleanup and mark as failed
-            if self.pipeline:
-                try:
-                    self.pipeline.set_state(Gst.State.NULL)
-                    self.pipeline = None
-                except:
-                    pass
+            try:
+                self.stop_pipeline()
+            except:
+                pass
 
             self.record_test_result(False, 0, 0)
             self.completed_combinations += 1
             # Schedule next test
-            GLib.timeout_add(100, self.run_next_test)
+            GLib.idle_add(self.run_next_test)
+
+    def _count_bytes(self, pad, info):
+        self._byte_count += info.get_buffer().get_size()
+        return Gst.PadProbeReturn.OK
 
     def finish_test_recording(self):
-        """Finish recording and measure results - simple approach"""
+        """Send EOS to finish the file; measuring happens once EOS arrives"""
+        self._finish_timer = None
+
+        if not self.pipeline:
+            self._measure_and_next()
+            return False
+
         try:
-            if self.pipeline:
-                # Send EOS to properly finish the file
-                self.pipeline.send_event(Gst.Event.new_eos())
-                time.sleep(0.5)  # Wait for EOS to process
-                self.pipeline.set_state(Gst.State.NULL)
-                self.pipeline = None
+            self.pipeline.send_event(Gst.Event.new_eos())
+            # Don't wait forever on a muxer that never posts EOS
+            self._eos_timer = GLib.timeout_add(2000, self._on_eos_timeout)
+        except Exception as e:
+            print(f"❌ Error finishing recording: {e}")
+            self.stop_pipeline()
+            self._measure_and_next()
 
-            self.is_recording = False
+        return False  # Don't repeat this timer
 
-            output_file = self.current_test['output_file']
+    def cancel_test_timers(self):
+        """Cancel the pending finish/EOS timers of the running test"""
+        for timer in (self._finish_timer, self._eos_timer):
+            if timer:
+                GLib.source_remove(timer)
+        self._finish_timer = None
+        self._eos_timer = None
+
+    def stop_pipeline(self):
+        """Drop the bus watch, pending timers and the pipeline itself"""
+        self.cancel_test_timers()
+
+        if self.pipeline:
+            self.pipeline.get_bus().remove_signal_watch()
+            self.pipeline.set_state(Gst.State.NULL)
+            self.pipeline = None
+            self._pipeline_group = None
+
+    def _on_eos(self, bus, msg):
+        if not self.is_recording:
+            return
+        # Back to READY: the file is closed but the device stays open for the next test
+        self.cancel_test_timers()
+        self.pipeline.set_state(Gst.State.READY)
+        self._measure_and_next()
+
+    def _on_eos_timeout(self):
+        self._eos_timer = None
+        print(f"\n   ⚠️  No EOS after 2s, stopping anyway", flush=True)
+        self.stop_pipeline()
+        self._measure_and_next()
+        return False
+
+    def _on_err(self, bus, msg):
+        if not self.is_recording:
+            return
+        err, _ = msg.parse_error()
+        print(f"\n   ⚠️  Pipeline error: {err.message}", flush=True)
+        self.stop_pipeline()
+        self._measure_and_next()
 
-            # Check if file was created and measure it
-            if os.path.exists(output_file):
-                file_size = os.path.getsize(output_file)
-                file_size_mb = file_size / (1024 * 1024)
+    def _measure_and_next(self):
+        """Measure the finished recording, then schedule the next test"""
+        try:
+            self.is_recording = False
 
-                # Simple check: if file exists with any reasonable size, consider success
-                if file_size > 1024:  # At least 1KB
-                    # Calculate actual bitrate based on 15-second recording
-                    bits = file_size * 8
-                    bitrate_bps = bits / self.recording_duration
-                    bitrate_kbps = bitrate_bps / 1000
+            # Size the muxed stream would have had on disk
+            file_size = self._byte_count
+            file_size_mb = file_size / (1024 * 1024)
 
-                    print(f"\n   ✅ Success: {file_size_mb:.2f} MB, {bitrate_kbps:.1f} kbps - Saved to SD card", flush=True)
-                    self.record_test_result(True, file_size_mb, bitrate_kbps)
-                else:
-                    print(f"\n   ❌ Failed: File too small ({file_size} bytes)", flush=True)
-                    self.record_test_result(False, 0, 0)
-                    # Delete failed files to save space
-                    try:
-                        os.remove(output_file)
-                    except:
-                        pass
+            # Simple check: any reasonable amount of data counts as success
+            if file_size > 1024:  # At least 1KB
+                # Calculate actual bitrate based on 15-second recording
+                bits = file_size * 8
+                bitrate_bps = bits / self.recording_duration
+                bitrate_kbps = bitrate_bps / 1000
 
+                print(f"\n   ✅ Success: {file_size_mb:.2f} MB, {bitrate_kbps:.1f} kbps", flush=True)
+                self.record_test_result(True, file_size_mb, bitrate_kbps)
             else:
-                print(f"\n   ❌ Failed: File not created", flush=True)
+                print(f"\n   ❌ Failed: Too little data ({file_size} bytes)", flush=True)
                 self.record_test_result(False, 0, 0)
 
         except Exception as e:
@@ -523,9 +620,7 @@ class ConsoleCameraAnalyzer:
         self.completed_combinations += 1
 
         # Schedule next test
-        GLib.timeout_add(500, self.run_next_test)
-
-        return False  # Don't repeat this timer
+        GLib.idle_add(self.run_next_test)
 
     def record_test_result(self, success, file_size_mb, bitrate_kbps):
         """Record the result of a test"""
@@ -552,6 +647,7 @@ class ConsoleCameraAnalyzer:
     def complete_analysis(self):
         """Complete the analysis and generate Excel file"""
         self.is_analyzing = False
+        self.stop_pipeline()
         print(f"\n\n🎉 Analysis complete! Generating Excel file...")
 
         # Generate Excel file
@@ -564,16 +660,12 @@ class ConsoleCameraAnalyzer:
         # Show summary
         self.show_results_summary()
 
-        # Show final file count on SD card
-        try:
-            video_files = len([f for f in os.listdir(self.temp_dir) if f.endswith(('.mp4', '.avi'))])
-            print(f"💾 {video_files} video files saved to SD card: {self.temp_dir}")
-        except:
-            pass
-
         if self.main_loop:
             self.main_loop.quit()
 
+        # Release the main thread only after the report is written
+        self._done.set()
+
     def show_results_summary(self):
         """Show a summary of results"""
         print("\n" + "=" * 50)
@@ -587,7 +679,20 @@ class ConsoleCameraAnalyzer:
             print(f"\n🎥 Device: {device_path}")
 
             for format_name, format_results in device_data.items():
-                successful = len([r for r in format_results if r['success']])
+                # One pass for the success count and the bitrate extremes
+                successful = 0
+                best = worst = None
+                best_kbps = float('-inf')
+                worst_kbps = float('inf')
+                for r in format_results:
+                    if not r['success']:
+                        continue
+                    successful += 1
+                    kbps = r['bitrate_kbps']
+                    if kbps > best_kbps:
+                        best, best_kbps = r, kbps
+                    if kbps < worst_kbps:
+                        worst, worst_kbps = r, kbps
                 total = len(format_results)
 
                 total_tested += total
@@ -598,10 +703,6 @@ class ConsoleCameraAnalyzer:
 
                 if successful > 0:
                     # Show best and worst performing combinations
-                    successful_results = [r for r in format_results if r['success']]
-                    best = max(successful_results, key=lambda x: x['bitrate_kbps'])
-                    worst = min(successful_results, key=lambda x: x['bitrate_kbps'])
-
                     w_best, h_best = best['resolution']
                     w_worst, h_worst = worst['resolution']
 
@@ -614,8 +715,15 @@ class ConsoleCameraAnalyzer:
         """Generate Excel file with real measured data"""
         print(f"📊 Generating Excel file: {self.output_excel}")
 
-        wb = Workbook()
-        wb.remove(wb.active)
+        if not self._lazy_xlsx():
+            raise RuntimeError("openpyxl not available")
+        from openpyxl import Workbook
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
+        from openpyxl.styles.fonts import DEFAULT_FONT
+
+        # Write-only mode streams rows out instead of holding every cell in memory
+        wb = Workbook(write_only=True)
 
         # Define styles
         header_font = Font(bold=True, color="FFFFFF")
@@ -626,7 +734,48 @@ class ConsoleCameraAnalyzer:
                        top=Side(style='thin'), bottom=Side(style='thin'))
         center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
 
+        # Register each style once; cells then reference it by name
+        for style in (
+            NamedStyle('header', font=header_font, fill=header_fill, border=border, alignment=center_align),
+            NamedStyle('data_default', font=DEFAULT_FONT, border=border, alignment=center_align),
+            NamedStyle('data_success', font=DEFAULT_FONT, fill=success_fill, border=border, alignment=center_align),
+            NamedStyle('data_fail', font=DEFAULT_FONT, fill=fail_fill, border=border, alignment=center_align),
+            NamedStyle('title', font=Font(bold=True, size=14)),
+            NamedStyle('summary_title', font=Font(bold=True, size=16)),
+            NamedStyle('bold', font=Font(bold=True)),
+        ):
+            wb.add_named_style(style)
+
+        def styled_cell(ws, value, style):
+            cell = WriteOnlyCell(ws, value=value)
+            cell.style = style
+            return cell
+
+        # Create summary sheet first so it stays at index 0
+        summary_ws = wb.create_sheet(title="CONSOLE_Summary")
+        summary_ws.append([styled_cell(summary_ws, "Console Real Camera Analysis Summary", 'summary_title')])
+        summary_ws.append([])
+
+        total_tested = 0
+        total_successful = 0
+
+        for device_path, device_data in self.analysis_results.items():
+            summary_ws.append([styled_cell(summary_ws, f"Device: {device_path}", 'bold')])
+
+            for format_name, format_results in device_data.items():
+                successful = sum(1 for r in format_results if r['success'])
+                total = len(format_results)
+
+                total_tested += total
+                total_successful += successful
+
+                summary_ws.append([None, f"{format_name}: {successful}/{total} combinations successful"])
+            summary_ws.append([])
+
+        summary_ws.append([styled_cell(summary_ws, f"TOTAL: {total_successful}/{total_tested} combinations successful", 'title')])
+
         # Process each device/format combination
+        headers = ['Resolution', 'FPS', 'Real Bitrate (kbps)', 'Real File Size 15s (MB)', 'Works']
         for device_path, device_data in self.analysis_results.items():
             device_name = device_path.replace('/dev/', '')
 
@@ -638,7 +787,7 @@ class ConsoleCameraAnalyzer:
                 sheet_name = f"{device_name}_{format_name}"
                 ws = wb.create_sheet(title=sheet_name)
 
-                # Convert to DataFrame
+                # Table rows, written straight to the sheet
                 df_data = []
                 for result in format_results:
                     w, h = result['resolution']
@@ -652,62 +801,18 @@ class ConsoleCameraAnalyzer:
                         'Works': "✓" if result['success'] else "✗"
                     })
 
-                df = pd.DataFrame(df_data)
-
                 # Write title
-                ws['A1'] = f"CONSOLE REAL DATA: {device_path} - {format_name}"
-                ws['A1'].font = Font(bold=True, size=14)
-                ws.merge_cells('A1:H1')
+                ws.append([styled_cell(ws, f"CONSOLE REAL DATA: {device_path} - {format_name}", 'title')])
+                ws.merged_cells.add('A1:H1')
+                ws.append([])
 
                 # Data table
-                row = 3
-                headers = ['Resolution', 'FPS', 'Real Bitrate (kbps)', 'Real File Size 15s (MB)', 'Works']
-                for col, header in enumerate(headers, 1):
-                    cell = ws.cell(row=row, column=col, value=header)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_align
-                    cell.border = border
-
-                row += 1
-                for _, data in df.iterrows():
-                    for col, header in enumerate(headers, 1):
-                        cell = ws.cell(row=row, column=col, value=data[header])
-                        cell.alignment = center_align
-                        cell.border = border
-
-                        if header == 'Works':
-                            if data[header] == "✓":
-                                cell.fill = success_fill
-                            else:
-                                cell.fill = fail_fill
-                    row += 1
-
-        # Create summary sheet
-        summary_ws = wb.create_sheet(title="CONSOLE_Summary", index=0)
-        summary_ws['A1'] = "Console Real Camera Analysis Summary"
-        summary_ws['A1'].font = Font(bold=True, size=16)
-
-        row = 3
-        total_tested = 0
-        total_successful = 0
-
-        for device_path, device_data in self.analysis_results.items():
-            summary_ws.cell(row=row, column=1, value=f"Device: {device_path}").font = Font(bold=True)
-            row += 1
-
-            for format_name, format_results in device_data.items():
-                successful = len([r for r in format_results if r['success']])
-                total = len(format_results)
-
-                total_tested += total
-                total_successful += successful
-
-                summary_ws.cell(row=row, column=2, value=f"{format_name}: {successful}/{total} combinations successful")
-                row += 1
-            row += 1
+                ws.append([styled_cell(ws, header, 'header') for header in headers])
 
-        summary_ws.cell(row=row, column=1, value=f"TOTAL: {total_successful}/{total_tested} combinations successful").font = Font(bold=True, size=14)
+                for data in df_data:
+                    row = [styled_cell(ws, data[header], 'data_default') for header in headers[:-1]]
+                    row.append(styled_cell(ws, data['Works'], 'data_success' if data['Works'] == "✓" else 'data_fail'))
+                    ws.append(row)
 
         wb.save(self.output_excel)
 
@@ -1,29 +1,47 @@
 #!/usr/bin/env python3
 # final_camera.py - Working camera app with simplified UI
 import gi
-import subprocess
-import glob
-import re
 import os
-import sys
-import time
+import atexit
 
 gi.require_version("Gtk", "3.0")
 gi.require_version("Gst", "1.0")
 from gi.repository import Gtk, Gdk, Gst, GLib
 
+from camera_common import (FormatProbeMixin, FALLBACK_FORMATS, get_video_devices,
+                           watch_dev, update_video_devices, converter_for_raw, require_converter,
+                           is_not_negotiated, parse_pipeline, ensure_gst_init)
+
 Gdk.set_allowed_backends("wayland")
 
 _prev_total = 0
 _prev_idle = 0
 
+def _open_proc(path):
+    try:
+        return os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+
+# Opened once; every tick is a single preadv() into a preallocated buffer
+_stat_fd = _open_proc('/proc/stat')
+_mem_fd = _open_proc('/proc/meminfo')
+_stat_buf = bytearray(256)
+_mem_buf = bytearray(4096)
+
+@atexit.register
+def _close_proc():
+    for fd in (_stat_fd, _mem_fd):
+        if fd is not None:
+            os.close(fd)
+
 def read_cpu_percent():
     global _prev_total, _prev_idle
     try:
-        with open('/proc/stat', 'r') as f:
-            line = f.readline()
-        parts = [float(x) for x in line.split()[1:8]]
-        user, nice, system, idle, iowait, irq, softirq = parts
+        n = os.preadv(_stat_fd, [_stat_buf], 0)
+        line = _stat_buf[:_stat_buf.index(b'\n', 0, n)]
+        # Jiffies are integers: parse and subtract as ints, only the final ratio is a float
+        user, nice, system, idle, iowait, irq, softirq = map(int, line.split(None, 8)[1:8])
         idle_all = idle + iowait
         non_idle = user + nice + system + irq + softirq
         total = idle_all + non_idle
@@ -39,49 +57,26 @@ def read_cpu_percent():
     except Exception:
         return 0.0
 
+def _meminfo_kb(key, n):
+    """Value of one /proc/meminfo field from _mem_buf, located with find() instead of a per-line parse"""
+    start = _mem_buf.find(key, 0, n)
+    if start < 0:
+        return 0
+    start += len(key)
+    return int(_mem_buf[start:_mem_buf.index(b'\n', start, n)].split()[0])
+
 def read_mem_percent():
     try:
-        meminfo = {}
-        with open('/proc/meminfo', 'r') as f:
-            for line in f:
-                key, val = line.split(':', 1)
-                meminfo[key.strip()] = int(val.strip().split()[0])
-        total = meminfo.get('MemTotal', 1)
-        free = meminfo.get('MemFree', 0) + meminfo.get('Buffers', 0) + meminfo.get('Cached', 0)
+        n = os.preadv(_mem_fd, [_mem_buf], 0)
+        # MemTotal is the first line; the leading newline keeps 'Cached:' from matching 'SwapCached:'
+        total = _meminfo_kb(b'MemTotal:', n) or 1
+        free = _meminfo_kb(b'\nMemFree:', n) + _meminfo_kb(b'\nBuffers:', n) + _meminfo_kb(b'\nCached:', n)
         used = max(0, total - free)
         return used * 100.0 / total
     except Exception:
         return 0.0
 
-def get_video_devices():
-    devices = []
-    for device_path in glob.glob('/dev/video*'):
-        device_num = int(re.findall(r'\d+', device_path)[-1])
-        if device_num >= 2:
-            try:
-                with open(device_path, 'rb') as f:
-                    devices.append(device_path)
-            except:
-                pass
-    return sorted(devices) if devices else ['/dev/video2']
-
-def get_device_formats(device_path):
-    try:
-        result = subprocess.run(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
-                              capture_output=True, text=True, timeout=3)
-        if result.returncode == 0:
-            formats = []
-            for line in result.stdout.split('\n'):
-                match = re.search(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)", line)
-                if match:
-                    code, desc = match.group(2), match.group(3)
-                    formats.append((code, f"{code} ({desc})"))
-            return formats if formats else [('MJPG', 'MJPG (Motion-JPEG)')]
-    except:
-        pass
-    return [('MJPG', 'MJPG (Motion-JPEG)'), ('YUYV', 'YUYV (YUV 4:2:2)')]
-
-class FinalCameraWindow(Gtk.Window):
+class FinalCameraWindow(FormatProbeMixin, Gtk.Window):
     def __init__(self):
         super().__init__(type=Gtk.WindowType.TOPLEVEL)
         self.set_title("USB Camera Touch Viewer")
@@ -93,17 +88,28 @@ class FinalCameraWindow(Gtk.Window):
         # Initialize variables
         self.video_devices = get_video_devices()
         self.device = self.video_devices[0]
-        self.available_formats = get_device_formats(self.device)
+        # Placeholder until probe_formats() reports back; keeps v4l2-ctl off the startup path
+        self.available_formats = FALLBACK_FORMATS
         self.current_format = self.available_formats[0][0]
         self.width, self.height, self.fps = 640, 480, 30
+        # Elements are made once in build_pipeline(); starts only relink and set properties
         self.pipeline = None
+        self.src = self.capsfilter = self.dec = self.conv = self.valve = self.sink = None
+        self._chain = []
+        self._pipeline_key = None
+        self._applied_caps = None
+        self._fallback = None
         self.is_running = False
+        self._last_usage_text = ''
+        self._dev_watch = None
+        # Button labels set during one callback are applied together on the next idle
+        self._pending_labels = {}
+        self._flush_scheduled = False
 
         # Simplified resolution list
         self.res_options = [(640, 480), (800, 600), (1280, 720), (1920, 1080)]
 
         print(f"Using device: {self.device}")
-        print(f"Available formats: {[f[0] for f in self.available_formats]}")
 
         self.setup_simple_ui()
 
@@ -195,36 +201,111 @@ class FinalCameraWindow(Gtk.Window):
 
     def delayed_init(self):
         """Single delayed initialization"""
+        self.probe_formats()
         try:
-            Gst.init(None)
+            self._dev_watch = watch_dev()
+            GLib.io_add_watch(self._dev_watch, GLib.PRIORITY_DEFAULT, GLib.IO_IN, self._on_dev_event)
+        except OSError as e:
+            print(f"Hot-plug watch unavailable: {e}")
+        try:
+            ensure_gst_init()
             self.status_label.set_text("GStreamer ready. Click Start Camera.")
-            # Start usage monitoring
-            GLib.timeout_add(2000, self.update_usage)  # Slower update rate
+            # Start usage monitoring; whole-second timers are batched with other wakeups
+            GLib.timeout_add_seconds(5, self.update_usage)
         except Exception as e:
             self.status_label.set_text(f"GStreamer error: {e}")
+            return False
+        try:
+            self.build_pipeline()
+        except Exception as e:
+            print(f"Pipeline build error: {e}")
         return False
 
+    def build_pipeline(self):
+        """Create every element once; start_camera() links the ones the layout needs"""
+        make = Gst.ElementFactory.make
+        elements = [make('v4l2src', 'src'), make('capsfilter', 'cf'), make('jpegdec', 'dec'),
+                    make('videoconvert', 'conv'), make('valve', 'valve'), make('waylandsink', 'sink')]
+        if None in elements:
+            raise RuntimeError("missing GStreamer element")
+        self.src, self.capsfilter, self.dec, self.conv, self.valve, self.sink = elements
+        # io-mode=4: v4l2src exports its capture buffers as DMABUF instead of copying them out
+        self.src.set_property('io-mode', 4)
+        self.pipeline = Gst.Pipeline.new('camera')
+        for element in elements:
+            self.pipeline.add(element)
+        bus = self.pipeline.get_bus()
+        bus.add_signal_watch()
+        bus.connect('message::error', self._on_bus_error)
+
+    def _on_bus_error(self, bus, msg):
+        if not self.is_running or self._fallback is not None:
+            return  # late message from a run that was already stopped or replaced
+        err, debug = msg.parse_error()
+        print(f"Pipeline error from {msg.src.get_name()}: {err.message}")
+        if self.conv not in self._chain and is_not_negotiated(err, debug):
+            # The display refused raw YUY2 after all; same elements, with videoconvert
+            print("YUY2 not accepted by the display, adding videoconvert")
+            require_converter('YUY2')
+            self.start_camera()
+        else:
+            self.status_label.set_text(f"Camera error: {err.message}")
+            self.start_fallback()
+
+    def chain_for(self, layout):
+        """Elements to link for a layout; the capsfilter lets Apply change size/rate in place"""
+        if layout == 'jpeg':
+            return [self.src, self.capsfilter, self.dec, self.conv, self.valve, self.sink]
+        if converter_for_raw('YUY2'):
+            return [self.src, self.capsfilter, self.conv, self.valve, self.sink]
+        return [self.src, self.capsfilter, self.valve, self.sink]
+
+    def link_chain(self, chain):
+        """Relink the (stopped) pipeline; elements left out stay in the bin unlinked"""
+        if chain == self._chain:
+            return
+        for upstream, downstream in zip(self._chain, self._chain[1:]):
+            upstream.unlink(downstream)
+        self._chain = []
+        for upstream, downstream in zip(chain, chain[1:]):
+            if not upstream.link(downstream):
+                raise RuntimeError(f"Could not link {upstream.get_name()} to {downstream.get_name()}")
+        self._chain = chain
+
     def cycle_device(self, btn):
         """Cycle through available devices"""
         try:
             current_idx = self.video_devices.index(self.device)
             next_idx = (current_idx + 1) % len(self.video_devices)
             self.device = self.video_devices[next_idx]
-            btn.set_label(self.device)
+            self.queue_label(btn, self.device)
             # Update formats for new device
-            self.available_formats = get_device_formats(self.device)
-            self.current_format = self.available_formats[0][0]
-            self.format_btn.set_label(self.current_format)
+            self.probe_formats()
         except Exception as e:
             print(f"Device cycle error: {e}")
 
+    def _on_dev_event(self, fd, condition):
+        """Apply /dev create/delete events for video nodes to the device list"""
+        self.video_devices = update_video_devices(self.video_devices, fd)
+        if self.device not in self.video_devices:
+            self.device = self.video_devices[0]
+            self.queue_label(self.device_btn, self.device)
+            self.probe_formats()
+        return True
+
+    def set_formats(self, formats):
+        self.available_formats = formats
+        self.current_format = formats[0][0]
+        self.queue_label(self.format_btn, self.current_format)
+        print(f"Available formats: {[f[0] for f in formats]}")
+
     def cycle_format(self, btn):
         """Cycle through available formats"""
         try:
             current_idx = next((i for i, (code, _) in enumerate(self.available_formats) if code == self.current_format), 0)
             next_idx = (current_idx + 1) % len(self.available_formats)
             self.current_format = self.available_formats[next_idx][0]
-            btn.set_label(self.current_format)
+            self.queue_label(btn, self.current_format)
         except Exception as e:
             print(f"Format cycle error: {e}")
 
@@ -234,7 +315,7 @@ class FinalCameraWindow(Gtk.Window):
             current_idx = next((i for i, (w, h) in enumerate(self.res_options) if w == self.width and h == self.height), 0)
             next_idx = (current_idx + 1) % len(self.res_options)
             self.width, self.height = self.res_options[next_idx]
-            btn.set_label(f"{self.width}x{self.height}")
+            self.queue_label(btn, f"{self.width}x{self.height}")
         except Exception as e:
             print(f"Resolution cycle error: {e}")
 
@@ -245,10 +326,23 @@ class FinalCameraWindow(Gtk.Window):
             current_idx = fps_options.index(self.fps) if self.fps in fps_options else 2
             next_idx = (current_idx + 1) % len(fps_options)
             self.fps = fps_options[next_idx]
-            btn.set_label(str(self.fps))
+            self.queue_label(btn, str(self.fps))
         except Exception as e:
             print(f"FPS cycle error: {e}")
 
+    def queue_label(self, widget, text):
+        self._pending_labels[widget] = text
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            GLib.idle_add(self._flush_labels, priority=GLib.PRIORITY_DEFAULT_IDLE)
+
+    def _flush_labels(self):
+        for widget, text in self._pending_labels.items():
+            widget.set_label(text)
+        self._pending_labels.clear()
+        self._flush_scheduled = False
+        return False
+
     def toggle_fullscreen(self, btn):
         """Toggle fullscreen mode"""
         try:
@@ -268,56 +362,116 @@ class FinalCameraWindow(Gtk.Window):
             self.start_camera()
 
     def on_apply(self, btn):
-        if self.is_running:
+        if not self.is_running:
+            return
+        layout, caps = self.pipeline_spec()
+        if self._fallback is None and self._pipeline_key == (self.device, layout):
+            if self.fps == 0 or caps == self._applied_caps:
+                # Pausing, or resuming at the running caps: only the valve moves,
+                # so there's no state change and no preroll
+                self.open_valve()
+                return
+            # Same device and element chain: renegotiate in place instead of
+            # tearing down. READY keeps v4l2src's device open.
+            self.pipeline.set_state(Gst.State.READY)
+            self.capsfilter.set_property('caps', Gst.Caps.from_string(caps))
+            self._applied_caps = caps
+            if not self.play():
+                self.start_fallback()
+        else:
             self.stop_camera()
             self.start_camera()
 
-    def start_camera(self):
-        try:
-            if self.pipeline:
-                self.stop_camera()
-
-            # Build simple pipeline
-            if self.current_format == 'MJPG' and self.fps > 0:
-                caps = f"image/jpeg,width={self.width},height={self.height},framerate={self.fps}/1"
-                pipeline_str = f"v4l2src device={self.device} ! {caps} ! jpegdec ! videoconvert ! waylandsink"
-            elif self.fps > 0:
-                caps = f"video/x-raw,format=YUY2,width={self.width},height={self.height},framerate={self.fps}/1"
-                pipeline_str = f"v4l2src device={self.device} ! {caps} ! videoconvert ! waylandsink"
-            else:
-                pipeline_str = f"v4l2src device={self.device} ! videoconvert ! waylandsink"
-
-            print(f"Pipeline: {pipeline_str}")
-            self.pipeline = Gst.parse_launch(pipeline_str)
-
-            if self.fps == 0:
-                self.pipeline.set_state(Gst.State.PAUSED)
-                self.status_label.set_text("Camera paused (0 FPS)")
-            else:
-                self.pipeline.set_state(Gst.State.PLAYING)
-                self.status_label.set_text(f"Camera: {self.current_format} {self.width}x{self.height}@{self.fps}fps")
+    def pipeline_spec(self):
+        """(layout, caps) for the current settings; layout picks the elements after the capsfilter"""
+        # At 0 FPS the camera runs at whatever rate it likes and the valve drops every frame
+        framerate = f",framerate={self.fps}/1" if self.fps > 0 else ""
+        if self.current_format == 'MJPG':
+            return 'jpeg', f"image/jpeg,width={self.width},height={self.height}{framerate}"
+        return 'yuy2', f"video/x-raw,format=YUY2,width={self.width},height={self.height}{framerate}"
+
+    def open_valve(self):
+        """Pass frames to the sink, or at 0 FPS drop them so the last one stays on screen"""
+        self.valve.set_property('drop', self.fps == 0)
+        if self.fps == 0:
+            self.status_label.set_text("Camera paused (0 FPS)")
+        else:
+            self.status_label.set_text(f"Camera: {self.current_format} {self.width}x{self.height}@{self.fps}fps")
+
+    def play(self):
+        """Run the built pipeline at the current settings; False if it refuses to change state"""
+        self.open_valve()
+        if self.pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            # Usually caps the camera can't deliver: let v4l2src choose, on the same elements
+            print("State change failed, retrying with ANY caps")
+            self.pipeline.set_state(Gst.State.NULL)
+            self.capsfilter.set_property('caps', Gst.Caps.new_any())
+            self._applied_caps = None
+            if self.pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+                self.pipeline.set_state(Gst.State.NULL)
+                return False
+            self.status_label.set_text(f"Camera: {self.current_format} (camera-chosen caps)")
+        return True
 
-            self.is_running = True
-            self.start_btn.set_label("Stop Camera")
+    def start_camera(self):
+        if self.is_running:
+            self.stop_camera()
 
+        try:
+            if self.pipeline is None:
+                raise RuntimeError("pipeline not built")
+            layout, caps = self.pipeline_spec()
+            chain = self.chain_for(layout)
+            self.link_chain(chain)
+            self.src.set_property('device', self.device)
+            self.capsfilter.set_property('caps', Gst.Caps.from_string(caps))
+            self._applied_caps = caps
+            self._pipeline_key = (self.device, layout)
+            print(f"Pipeline: {' ! '.join(e.get_factory().get_name() for e in chain)} "
+                  f"(device {self.device}, caps {caps})")
         except Exception as e:
             print(f"Pipeline error: {e}")
-            try:
-                fallback = f"v4l2src device={self.device} ! videoconvert ! waylandsink"
-                self.pipeline = Gst.parse_launch(fallback)
-                self.pipeline.set_state(Gst.State.PLAYING)
-                self.is_running = True
-                self.start_btn.set_label("Stop Camera")
-                self.status_label.set_text("Camera running (basic mode)")
-                print(f"Fallback: {fallback}")
-            except Exception as e2:
-                print(f"Complete failure: {e2}")
-                self.status_label.set_text(f"Failed: {e2}")
+            self.start_fallback()
+            return
+
+        if not self.play():
+            self.start_fallback()
+            return
+        self.is_running = True
+        self.start_btn.set_label("Stop Camera")
+
+    def start_fallback(self):
+        """Basic-mode pipeline, only used when the built one can't run at all"""
+        self._pipeline_key = None
+        if self.pipeline is not None:
+            self.pipeline.set_state(Gst.State.NULL)
+        fallback = f"v4l2src device={self.device} ! videoconvert ! waylandsink"
+        try:
+            self._fallback = parse_pipeline(fallback)
+        except GLib.Error as e:
+            print(f"Complete failure: {e.message}")
+            self.status_label.set_text(f"Failed: {e.message}")
+            return
+        if self._fallback.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            self._fallback.set_state(Gst.State.NULL)
+            self._fallback = None
+            self.is_running = False
+            self.start_btn.set_label("Start Camera")
+            print(f"Complete failure: {fallback} would not start")
+            self.status_label.set_text(f"Failed: cannot start {self.device}")
+            return
+        self.is_running = True
+        self.start_btn.set_label("Stop Camera")
+        self.status_label.set_text("Camera running (basic mode)")
+        print(f"Fallback: {fallback}")
 
     def stop_camera(self):
+        # The built pipeline is kept (just stopped) for the next start
         if self.pipeline:
             self.pipeline.set_state(Gst.State.NULL)
-            self.pipeline = None
+        if self._fallback:
+            self._fallback.set_state(Gst.State.NULL)
+            self._fallback = None
         self.is_running = False
         self.start_btn.set_label("Start Camera")
         self.status_label.set_text("Camera stopped")
@@ -326,7 +480,11 @@ class FinalCameraWindow(Gtk.Window):
         try:
             cpu = read_cpu_percent()
             mem = read_mem_percent()
-            self.usage_label.set_text(f"CPU {cpu:.0f}% | RAM {mem:.0f}%")
+            text = f"CPU {cpu:.0f}% | RAM {mem:.0f}%"
+            # Skip the label relayout when the rounded values didn't move
+            if text != self._last_usage_text:
+                self.usage_label.set_text(text)
+                self._last_usage_text = text
         except:
             pass
         return True
@@ -1,46 +1,17 @@
 #!/usr/bin/env python3
 # full_camera.py - Complete camera app with all features
 import gi
-import subprocess
-import glob
-import re
-import os
 
 gi.require_version("Gtk", "3.0")
 gi.require_version("Gst", "1.0")
 from gi.repository import Gtk, Gdk, Gst, GLib
 
+from camera_common import (FormatProbeMixin, FALLBACK_FORMATS, get_video_devices,
+                           converter_for_raw, parse_pipeline, ensure_gst_init)
+
 Gdk.set_allowed_backends("wayland")
 
-def get_video_devices():
-    devices = []
-    for device_path in glob.glob('/dev/video*'):
-        device_num = int(re.findall(r'\d+', device_path)[-1])
-        if device_num >= 2:  # Skip /dev/video0 and /dev/video1
-            try:
-                with open(device_path, 'rb') as f:
-                    devices.append(device_path)
-            except (PermissionError, OSError):
-                pass
-    return sorted(devices) if devices else ['/dev/video2']
-
-def get_device_formats(device_path):
-    try:
-        result = subprocess.run(['v4l2-ctl', '--device', device_path, '--list-formats-ext'],
-                              capture_output=True, text=True, timeout=3)
-        if result.returncode == 0:
-            formats = []
-            for line in result.stdout.split('\n'):
-                match = re.search(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)", line)
-                if match:
-                    code, desc = match.group(2), match.group(3)
-                    formats.append((code, f"{code} ({desc})"))
-            return formats if formats else [('MJPG', 'MJPG (Motion-JPEG)')]
-    except:
-        pass
-    return [('MJPG', 'MJPG (Motion-JPEG)'), ('YUYV', 'YUYV (YUV 4:2:2)')]
-
-class FullCameraWindow(Gtk.Window):
+class FullCameraWindow(FormatProbeMixin, Gtk.Window):
     def __init__(self):
         super().__init__(type=Gtk.WindowType.TOPLEVEL)
         self.set_title("USB Camera Touch Viewer")
@@ -49,19 +20,22 @@ class FullCameraWindow(Gtk.Window):
         # Initialize variables
         self.video_devices = get_video_devices()
         self.device = self.video_devices[0]
-        self.available_formats = get_device_formats(self.device)
+        # Placeholder until probe_formats() reports back; keeps v4l2-ctl off the startup path
+        self.available_formats = FALLBACK_FORMATS
         self.current_format = self.available_formats[0][0]
         self.width, self.height, self.fps = 640, 480, 30
         self.pipeline = None
 
         self.res_options = [(320, 240), (640, 480), (800, 600), (1280, 720), (1920, 1080)]
+        self.fps_options = [15, 30, 60]
 
         self.setup_ui()
         self.show_all()
         self.fullscreen()
+        self.probe_formats()
 
         # Initialize GStreamer AFTER UI is shown
-        Gst.init(None)
+        ensure_gst_init()
 
         # Auto-start camera
         GLib.timeout_add(1000, self.start_camera)  # Start after 1 second
@@ -109,13 +83,13 @@ class FullCameraWindow(Gtk.Window):
 
         # FPS
         controls.pack_start(Gtk.Label(label="FPS:"), False, False, 0)
-        self.fps_scale = Gtk.HScale()
-        self.fps_scale.set_range(1, 60)
-        self.fps_scale.set_value(30)
-        self.fps_scale.set_digits(0)
-        self.fps_scale.set_size_request(150, -1)
-        self.fps_scale.connect("value-changed", self.on_fps_changed)
-        controls.pack_start(self.fps_scale, False, False, 0)
+        # Fixed steps (final_camera's, minus its 0 FPS pause); a slider fired value-changed per pixel dragged
+        self.fps_combo = Gtk.ComboBoxText()
+        for fps in self.fps_options:
+            self.fps_combo.append_text(str(fps))
+        self.fps_combo.set_active(self.fps_options.index(self.fps))
+        self.fps_combo.connect("changed", self.on_fps_changed)
+        controls.pack_start(self.fps_combo, False, False, 0)
 
         # Buttons
         self.apply_btn = Gtk.Button(label="Apply")
@@ -130,10 +104,10 @@ class FullCameraWindow(Gtk.Window):
         idx = combo.get_active()
         if idx >= 0:
             self.device = self.video_devices[idx]
-            self.update_formats()
+            self.probe_formats()
 
-    def update_formats(self):
-        self.available_formats = get_device_formats(self.device)
+    def set_formats(self, formats):
+        self.available_formats = formats
         self.format_combo.remove_all()
         for code, desc in self.available_formats:
             self.format_combo.append_text(desc)
@@ -150,8 +124,10 @@ class FullCameraWindow(Gtk.Window):
         if idx >= 0:
             self.width, self.height = self.res_options[idx]
 
-    def on_fps_changed(self, scale):
-        self.fps = int(scale.get_value())
+    def on_fps_changed(self, combo):
+        idx = combo.get_active()
+        if idx >= 0:
+            self.fps = self.fps_options[idx]
 
     def on_apply(self, btn):
         self.start_camera()
@@ -165,16 +141,17 @@ class FullCameraWindow(Gtk.Window):
             # Build pipeline based on format
             if self.current_format == 'MJPG':
                 caps = f"image/jpeg,width={self.width},height={self.height},framerate={self.fps}/1"
-                pipeline_str = f"v4l2src device={self.device} ! {caps} ! jpegdec ! videoconvert ! waylandsink"
+                # io-mode=4: v4l2src exports its capture buffers as DMABUF instead of copying them out
+                pipeline_str = f"v4l2src device={self.device} io-mode=4 ! {caps} ! jpegdec ! videoconvert ! waylandsink"
             else:
                 # Raw formats
                 format_map = {'YUYV': 'YUY2', 'YUV420': 'I420', 'UYVY': 'UYVY'}
                 gst_format = format_map.get(self.current_format, 'YUY2')
                 caps = f"video/x-raw,format={gst_format},width={self.width},height={self.height},framerate={self.fps}/1"
-                pipeline_str = f"v4l2src device={self.device} ! {caps} ! videoconvert ! waylandsink"
+                pipeline_str = f"v4l2src device={self.device} io-mode=4 ! {caps} ! {converter_for_raw(gst_format)}waylandsink"
 
             print(f"Pipeline: {pipeline_str}")
-            self.pipeline = Gst.parse_launch(pipeline_str)
+            self.pipeline = parse_pipeline(pipeline_str)
             self.pipeline.set_state(Gst.State.PLAYING)
 
         except Exception as e:
@@ -182,7 +159,7 @@ class FullCameraWindow(Gtk.Window):
             # Fallback to simple pipeline
             try:
                 simple_pipeline = f"v4l2src device={self.device} ! videoconvert ! waylandsink"
-                self.pipeline = Gst.parse_launch(simple_pipeline)
+                self.pipeline = parse_pipeline(simple_pipeline)
                 self.pipeline.set_state(Gst.State.PLAYING)
                 print(f"Fallback pipeline: {simple_pipeline}")
             except Exception as e2:
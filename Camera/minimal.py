@@ -1,6 +1,11 @@
- #!/usr/bin/env python3
+#!/usr/bin/env python3
+# minimal.py - Bare GTK window; --with-gst also loads Gst to check it doesn't break startup
+import sys
 import gi
 gi.require_version("Gtk", "3.0")
+if '--with-gst' in sys.argv:
+    gi.require_version("Gst", "1.0")
+    from gi.repository import Gst  # noqa: F401 - imported only to check it loads
 from gi.repository import Gtk, Gdk
 Gdk.set_allowed_backends("wayland")
 
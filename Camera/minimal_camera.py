@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-# working_camera.py - Fixed camera app
+# minimal_camera.py - Fixed camera app
 import gi
 gi.require_version("Gtk", "3.0")
 gi.require_version("Gst", "1.0")
@@ -7,47 +7,47 @@ from gi.repository import Gtk, Gdk, Gst
 
 Gdk.set_allowed_backends("wayland")
 
-def on_resize(self, widget, allocation):
-    margin_x = int(allocation.width * 0.10)
-    margin_y = int(allocation.height * 0.10)
-    self.btn.set_margin_right(margin_x)
-    self.btn.set_margin_top(margin_y)
-
 class CameraWindow(Gtk.Window):
     def __init__(self):
-    super().__init__(type=Gtk.WindowType.TOPLEVEL)
-    self.set_title("Working Camera")
-    self.connect("destroy", Gtk.main_quit)
+        super().__init__(type=Gtk.WindowType.TOPLEVEL)
+        self.set_title("Working Camera")
+        self.connect("destroy", Gtk.main_quit)
+
+        vbox = Gtk.VBox()
+        self.add(vbox)
 
-    vbox = Gtk.VBox()
-    self.add(vbox)
+        # Overlay holds video + button
+        overlay = Gtk.Overlay()
+        vbox.pack_start(overlay, True, True, 0)
 
-    # Overlay holds video + button
-    overlay = Gtk.Overlay()
-    vbox.pack_start(overlay, True, True, 0)
+        # Video area
+        self.video_area = Gtk.Box()
+        self.video_area.set_size_request(640, 480)
+        overlay.add(self.video_area)
 
-    # Video area
-    self.video_area = Gtk.Box()
-    self.video_area.set_size_request(640, 480)
-    overlay.add(self.video_area)
+        # Start Camera button
+        self.btn = Gtk.Button(label="Start Camera")
+        self.btn.connect("clicked", self.start_camera)
+        overlay.add_overlay(self.btn)
 
-    # Start Camera button
-    self.btn = Gtk.Button(label="Start Camera")
-    self.btn.connect("clicked", self.start_camera)
-    overlay.add_overlay(self.btn)
+        # Position button top-right
+        self.btn.set_halign(Gtk.Align.END)
+        self.btn.set_valign(Gtk.Align.START)
 
-    # Position button top-right
-    self.btn.set_halign(Gtk.Align.END)
-    self.btn.set_valign(Gtk.Align.START)
+        # Update margins whenever window resizes → keeps 10% offset
+        self.connect("size-allocate", self.on_resize)
 
-    # Update margins whenever window resizes → keeps 10% offset
-    self.connect("size-allocate", self.on_resize)
+        self.show_all()
+        self.fullscreen()
 
-    self.show_all()
-    self.fullscreen()
+        Gst.init(None)
+        self.pipeline = None
 
-    Gst.init(None)
-    self.pipeline = None
+    def on_resize(self, widget, allocation):
+        margin_x = int(allocation.width * 0.10)
+        margin_y = int(allocation.height * 0.10)
+        self.btn.set_margin_right(margin_x)
+        self.btn.set_margin_top(margin_y)
 
     def start_camera(self, btn):
         if self.pipeline:
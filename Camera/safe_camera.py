@@ -1,36 +1,19 @@
 #!/usr/bin/env python3
 # safe_camera.py - Safe camera app with error handling
 import gi
-import subprocess
-import glob
-import re
-import os
 import sys
 
 gi.require_version("Gtk", "3.0")
 gi.require_version("Gst", "1.0")
 from gi.repository import Gtk, Gdk, Gst, GLib
 
-Gdk.set_allowed_backends("wayland")
+from camera_common import FALLBACK_FORMATS, get_video_devices, ensure_gst_init
 
-def get_video_devices():
-    devices = []
-    try:
-        for device_path in glob.glob('/dev/video*'):
-            device_num = int(re.findall(r'\d+', device_path)[-1])
-            if device_num >= 2:
-                try:
-                    with open(device_path, 'rb') as f:
-                        devices.append(device_path)
-                except:
-                    pass
-    except Exception as e:
-        print(f"Device detection error: {e}")
-    return sorted(devices) if devices else ['/dev/video2']
+Gdk.set_allowed_backends("wayland")
 
 def get_device_formats(device_path):
     # Return safe defaults without subprocess for now
-    return [('MJPG', 'MJPG (Motion-JPEG)'), ('YUYV', 'YUYV (YUV 4:2:2)')]
+    return FALLBACK_FORMATS
 
 class SafeCameraWindow(Gtk.Window):
     def __init__(self):
@@ -96,7 +79,7 @@ class SafeCameraWindow(Gtk.Window):
 
     def init_gstreamer(self):
         try:
-            Gst.init(None)
+            ensure_gst_init()
             self.status_label.set_text("GStreamer initialized. Ready to start camera.")
             print("GStreamer initialized")
         except Exception as e:
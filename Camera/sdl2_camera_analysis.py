@@ -8,18 +8,17 @@ import glob
 import subprocess
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Check if required modules are available
 try:
     import pandas as pd
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-    from openpyxl.utils import get_column_letter
+    import xlsxwriter
 except ImportError as e:
     print(f"Required module missing: {e}")
     print("Please install required modules:")
-    print("pip install pandas openpyxl")
+    print("pip install pandas xlsxwriter")
     sys.exit(1)
 
 try:
@@ -34,7 +33,28 @@ except ImportError as e:
     print("GStreamer python bindings required")
     sys.exit(1)
 
+# v4l2-ctl --list-formats-ext tokens: format (groups 1-3), size (4-5), interval (6)
+_TOKEN_RE = re.compile(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)"
+                       r"|Size:\s+Discrete\s+(\d+)x(\d+)"
+                       r"|Interval:\s+Discrete\s+[\d.]+s\s+\(([\d.]+)\s+fps\)")
+
+# Bordered, centred and wrapped; shared by every table cell format
+_CELL_PROPS = {'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True}
+
 class SDL2CameraAnalyzer:
+    # xlsxwriter format properties per cell class; handles are created once per workbook
+    _EXCEL_FORMATS = {
+        'header': dict(_CELL_PROPS, bold=True, font_color='#FFFFFF', bg_color='#4472C4', pattern=1),
+        'row_label': dict(_CELL_PROPS, bold=True),
+        'data': _CELL_PROPS,
+        'success': dict(_CELL_PROPS, bg_color='#C6EFCE', pattern=1),
+        'fail': dict(_CELL_PROPS, bg_color='#FFC7CE', pattern=1),
+        'section': {'bold': True, 'font_size': 12},
+        'title': {'bold': True, 'font_size': 14},
+        'summary_title': {'bold': True, 'font_size': 16},
+        'bold': {'bold': True},
+    }
+
     def __init__(self):
         # Set environment variables for Docker/Weston compatibility
         os.environ['SDL_VIDEODRIVER'] = 'wayland'
@@ -91,6 +111,9 @@ class SDL2CameraAnalyzer:
         self.font_medium = pygame.font.Font(None, 24)
         self.font_small = pygame.font.Font(None, 18)
 
+        # Rendered text surfaces, keyed by (text, font, color); most labels repeat every frame
+        self._text_cache = {}
+
         # Analysis settings
         self.recording_duration = 15  # seconds
         self.wait_duration = 16  # seconds
@@ -124,7 +147,8 @@ class SDL2CameraAnalyzer:
 
         # Start main loop
         self.running = True
-        self.clock = pygame.time.Clock()
+        # Set by anything that changes what is on screen; the loop only redraws when it is set
+        self._dirty = True
 
     def parse_v4l2_output(self, device_path):
         """Parse v4l2-ctl output to extract real device capabilities"""
@@ -137,44 +161,26 @@ class SDL2CameraAnalyzer:
 
             capabilities = {}
             current_format = None
+            current_resolution = None
 
-            lines = result.stdout.split('\n')
-
-            for line in lines:
-                line = line.strip()
-
-                # Look for format lines
-                format_match = re.search(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)", line)
-                if format_match:
-                    format_code = format_match.group(2)
-                    format_desc = format_match.group(3)
-                    current_format = format_code
+            # One pass over the whole output; no per-line split
+            for token in _TOKEN_RE.finditer(result.stdout):
+                if token.group(2) is not None:
+                    current_format = token.group(2)
+                    current_resolution = None
                     capabilities[current_format] = {
-                        'description': format_desc,
+                        'description': token.group(3),
                         'resolutions': {}
                     }
-                    continue
-
-                # Look for size lines
-                size_match = re.search(r"Size:\s+Discrete\s+(\d+)x(\d+)", line)
-                if size_match and current_format:
-                    width = int(size_match.group(1))
-                    height = int(size_match.group(2))
-                    resolution = (width, height)
 
-                    if resolution not in capabilities[current_format]['resolutions']:
-                        capabilities[current_format]['resolutions'][resolution] = []
-                    continue
+                elif token.group(4) is not None:
+                    if current_format:
+                        current_resolution = (int(token.group(4)), int(token.group(5)))
+                        capabilities[current_format]['resolutions'].setdefault(current_resolution, [])
 
-                # Look for interval lines
-                interval_match = re.search(r"Interval:\s+Discrete\s+[\d.]+s\s+\(([\d.]+)\s+fps\)", line)
-                if interval_match and current_format:
-                    fps = float(interval_match.group(1))
+                elif current_resolution:
                     # Add this fps to the last resolution found
-                    resolutions = capabilities[current_format]['resolutions']
-                    if resolutions:
-                        last_resolution = list(resolutions.keys())[-1]
-                        capabilities[current_format]['resolutions'][last_resolution].append(fps)
+                    capabilities[current_format]['resolutions'][current_resolution].append(float(token.group(6)))
 
             return capabilities
 
@@ -184,10 +190,18 @@ class SDL2CameraAnalyzer:
 
     def get_real_device_capabilities(self):
         """Get video devices and their REAL capabilities from v4l2-ctl"""
-        for device_path in glob.glob('/dev/video*'):
+        device_paths = sorted(glob.glob('/dev/video*'))
+        for device_path in device_paths:
+            print(f"Checking {device_path}...")
+
+        # Probes are just v4l2-ctl subprocess waits, so run them side by side;
+        # results are still collected in device order
+        with ThreadPoolExecutor(max_workers=min(8, len(device_paths) or 1)) as executor:
+            probes = [executor.submit(self.parse_v4l2_output, device_path) for device_path in device_paths]
+
+        for device_path, probe in zip(device_paths, probes):
             try:
-                print(f"Checking {device_path}...")
-                capabilities = self.parse_v4l2_output(device_path)
+                capabilities = probe.result()
 
                 if capabilities:
                     device_info = {
@@ -217,6 +231,17 @@ class SDL2CameraAnalyzer:
         except Exception as e:
             print(f"Error creating temp directory: {e}")
 
+    def render_text(self, text, font, color):
+        """Render text once and reuse the surface on later frames"""
+        key = (text, font, color)
+        text_surface = self._text_cache.get(key)
+        if text_surface is None:
+            # Progress and test labels change every test; keep the cache from growing unbounded
+            if len(self._text_cache) >= 256:
+                self._text_cache.clear()
+            text_surface = self._text_cache[key] = font.render(text, True, color)
+        return text_surface
+
     def draw_button(self, rect, text, color, text_color=None, enabled=True):
         """Draw a button with text"""
         if not enabled:
@@ -228,7 +253,7 @@ class SDL2CameraAnalyzer:
         if text_color is None:
             text_color = self.WHITE if color == self.BLUE else self.BLACK
 
-        text_surface = self.font_medium.render(text, True, text_color)
+        text_surface = self.render_text(text, self.font_medium, text_color)
         text_rect = text_surface.get_rect(center=rect.center)
         self.screen.blit(text_surface, text_rect)
 
@@ -236,7 +261,7 @@ class SDL2CameraAnalyzer:
         """Draw text at position"""
         if color is None:
             color = self.BLACK
-        text_surface = font.render(text, True, color)
+        text_surface = self.render_text(text, font, color)
         self.screen.blit(text_surface, (x, y))
         return text_surface.get_height()
 
@@ -247,19 +272,28 @@ class SDL2CameraAnalyzer:
 
         words = text.split(' ')
         lines = []
-        current_line = ""
-
-        for word in words:
-            test_line = current_line + word + " "
-            if font.size(test_line)[0] <= max_width:
-                current_line = test_line
-            else:
-                if current_line:
-                    lines.append(current_line.strip())
-                current_line = word + " "
+        start = 0
+
+        def fits(count):
+            return font.size(' '.join(words[start:start + count]) + " ")[0] <= max_width
+
+        while start < len(words):
+            # Double the word count until it overflows, then binary search that bracket for
+            # the most words that fit; a word wider than the line gets a line to itself
+            remaining = len(words) - start
+            low, high = 1, 2
+            while high <= remaining and fits(high):
+                low, high = high, high * 2
+            high = min(high - 1, remaining)
+            while low < high:
+                mid = (low + high + 1) // 2
+                if fits(mid):
+                    low = mid
+                else:
+                    high = mid - 1
 
-        if current_line:
-            lines.append(current_line.strip())
+            lines.append(' '.join(words[start:start + low]).strip())
+            start += low
 
         total_height = 0
         for line in lines:
@@ -315,7 +349,7 @@ class SDL2CameraAnalyzer:
 
         # Progress text
         progress_text = f"{self.completed_combinations}/{self.total_combinations} ({progress_pct:.1f}%)"
-        text_surface = self.font_small.render(progress_text, True, self.BLACK)
+        text_surface = self.render_text(progress_text, self.font_small, self.BLACK)
         text_rect = text_surface.get_rect(center=(self.screen_width // 2, y_offset + 15))
         self.screen.blit(text_surface, text_rect)
 
@@ -342,9 +376,13 @@ class SDL2CameraAnalyzer:
             elif self.scroll_down_button.collidepoint(event.pos):
                 self.scroll_offset = min(self.max_scroll, self.scroll_offset + 50)
 
-    def handle_events(self):
+    def handle_events(self, events):
         """Handle SDL2 events"""
-        for event in pygame.event.get():
+        for event in events:
+            # Pointer motion alone changes nothing on screen
+            if event.type != pygame.MOUSEMOTION:
+                self._dirty = True
+
             if event.type == pygame.QUIT:
                 self.running = False
 
@@ -364,19 +402,26 @@ class SDL2CameraAnalyzer:
                 else:
                     self.handle_scroll(event)
 
+            elif event.type == pygame.USEREVENT + 1:
+                # Run next test
+                self.run_next_test()
+            elif event.type == pygame.USEREVENT + 2:
+                # Finish current recording
+                self.finish_test_recording()
+
     def draw_ui(self):
         """Draw the main UI"""
         self.screen.fill(self.WHITE)
 
         # Title
         title = "SDL2 Camera Analysis"
-        title_surface = self.font_large.render(title, True, self.BLUE)
+        title_surface = self.render_text(title, self.font_large, self.BLUE)
         title_rect = title_surface.get_rect(center=(self.screen_width // 2, 40))
         self.screen.blit(title_surface, title_rect)
 
         # Subtitle
         subtitle = f"Real-time analysis of {self.total_combinations} combinations"
-        subtitle_surface = self.font_medium.render(subtitle, True, self.BLACK)
+        subtitle_surface = self.render_text(subtitle, self.font_medium, self.BLACK)
         subtitle_rect = subtitle_surface.get_rect(center=(self.screen_width // 2, 70))
         self.screen.blit(subtitle_surface, subtitle_rect)
 
@@ -624,17 +669,36 @@ class SDL2CameraAnalyzer:
         """Generate Excel file with real measured data"""
         print(f"Generating Excel file: {self.output_excel}")
 
-        wb = Workbook()
-        wb.remove(wb.active)
+        wb = xlsxwriter.Workbook(self.output_excel)
+
+        # One handle per cell class, shared by every cell of that class
+        fmt = {name: wb.add_format(props) for name, props in self._EXCEL_FORMATS.items()}
+        works_fmt = {"✓": fmt['success'], "✗": fmt['fail']}
+
+        # Create summary sheet first so it stays at index 0
+        summary_ws = wb.add_worksheet("SDL2_REAL_Summary")
+        summary_ws.write(0, 0, "SDL2 Real Camera Analysis Summary", fmt['summary_title'])
+
+        row = 2
+        total_tested = 0
+        total_successful = 0
+
+        for device_path, device_data in self.analysis_results.items():
+            summary_ws.write(row, 0, f"Device: {device_path}", fmt['bold'])
+            row += 1
+
+            for format_name, format_results in device_data.items():
+                successful = len([r for r in format_results if r['success']])
+                total = len(format_results)
 
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        success_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        fail_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-        border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                       top=Side(style='thin'), bottom=Side(style='thin'))
-        center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
+                total_tested += total
+                total_successful += successful
+
+                summary_ws.write(row, 1, f"{format_name}: {successful}/{total} combinations successful")
+                row += 1
+            row += 1
+
+        summary_ws.write(row, 0, f"TOTAL: {total_successful}/{total_tested} combinations successful", fmt['title'])
 
         # Process each device/format combination
         for device_path, device_data in self.analysis_results.items():
@@ -646,7 +710,7 @@ class SDL2CameraAnalyzer:
 
                 # Create worksheet
                 sheet_name = f"{device_name}_{format_name}"
-                ws = wb.create_sheet(title=sheet_name)
+                ws = wb.add_worksheet(sheet_name)
 
                 # Convert to DataFrame
                 df_data = []
@@ -664,160 +728,90 @@ class SDL2CameraAnalyzer:
 
                 df = pd.DataFrame(df_data)
 
+                # Rows are collected as (value, format) pairs so column widths can be measured first
+                rows = []
+
                 # Write title
-                ws['A1'] = f"SDL2 REAL DATA: {device_path} - {format_name}"
-                ws['A1'].font = Font(bold=True, size=14)
-                ws.merge_cells('A1:H1')
+                title = f"SDL2 REAL DATA: {device_path} - {format_name}"
+                ws.merge_range('A1:H1', title, fmt['title'])
+                rows.append([(title, None)])
+                rows.append([])
 
                 # Create matrix
                 resolutions = df['Resolution'].unique()
                 fps_values = sorted(df['FPS'].unique())
 
                 # Headers
-                row = 3
-                ws[f'A{row}'] = "Resolution"
-                ws[f'A{row}'].font = header_font
-                ws[f'A{row}'].fill = header_fill
-                ws[f'A{row}'].alignment = center_align
-                ws[f'A{row}'].border = border
-
-                col = 2
-                for fps in fps_values:
-                    cell = ws.cell(row=row, column=col, value=f"{fps} FPS")
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_align
-                    cell.border = border
-                    col += 1
+                rows.append([("Resolution", fmt['header'])] + [(f"{fps} FPS", fmt['header']) for fps in fps_values])
+
+                # One lookup per matrix cell; reversed so the first result for a combination wins
+                results_by_cell = {(data['Resolution'], data['FPS']): data for data in reversed(df_data)}
 
                 # Fill matrix
-                row += 1
                 for resolution in resolutions:
-                    ws.cell(row=row, column=1, value=resolution).font = Font(bold=True)
-                    ws.cell(row=row, column=1).alignment = center_align
-                    ws.cell(row=row, column=1).border = border
+                    cells = [(resolution, fmt['row_label'])]
 
-                    col = 2
                     for fps in fps_values:
-                        matching = df[(df['Resolution'] == resolution) & (df['FPS'] == fps)]
+                        data = results_by_cell.get((resolution, fps))
 
-                        if not matching.empty:
-                            data = matching.iloc[0]
+                        if data is not None:
                             bitrate = data['Real Bitrate (kbps)']
                             filesize = data['Real File Size 15s (MB)']
                             works = data['Works']
 
                             if works == "✓":
-                                cell_content = f"{bitrate} kbps\n{filesize} MB\n✓ SDL2"
-                                cell_fill = success_fill
+                                cells.append((f"{bitrate} kbps\n{filesize} MB\n✓ SDL2", fmt['success']))
                             else:
-                                cell_content = "FAILED\n0 MB\n✗"
-                                cell_fill = fail_fill
-
-                            cell = ws.cell(row=row, column=col, value=cell_content)
-                            cell.alignment = center_align
-                            cell.border = border
-                            cell.fill = cell_fill
+                                cells.append(("FAILED\n0 MB\n✗", fmt['fail']))
 
                         else:
-                            cell = ws.cell(row=row, column=col, value="N/A")
-                            cell.alignment = center_align
-                            cell.border = border
+                            cells.append(("N/A", fmt['data']))
 
-                        col += 1
-                    row += 1
+                    rows.append(cells)
 
                 # Add detailed table
-                row += 2
-                ws.cell(row=row, column=1, value="SDL2 REAL MEASURED DATA:").font = Font(bold=True, size=12)
-                row += 1
+                rows += [[], []]
+                rows.append([("SDL2 REAL MEASURED DATA:", fmt['section'])])
 
                 headers = ['Resolution', 'FPS', 'Real Bitrate (kbps)', 'Real File Size 15s (MB)', 'Works']
-                for col, header in enumerate(headers, 1):
-                    cell = ws.cell(row=row, column=col, value=header)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_align
-                    cell.border = border
+                rows.append([(header, fmt['header']) for header in headers])
 
-                row += 1
                 for _, data in df.iterrows():
-                    for col, header in enumerate(headers, 1):
-                        cell = ws.cell(row=row, column=col, value=data[header])
-                        cell.alignment = center_align
-                        cell.border = border
-
-                        if header == 'Works':
-                            if data[header] == "✓":
-                                cell.fill = success_fill
-                            else:
-                                cell.fill = fail_fill
-                    row += 1
-
-                # Auto-adjust column widths
-                for col_num in range(1, ws.max_column + 1):
-                    max_length = 0
-                    column_letter = get_column_letter(col_num)
+                    cells = [(data[header], fmt['data']) for header in headers[:-1]]
+                    cells.append((data['Works'], works_fmt[data['Works']]))
+                    rows.append(cells)
 
-                    for row_num in range(1, ws.max_row + 1):
-                        cell = ws.cell(row=row_num, column=col_num)
-                        try:
-                            if cell.value and len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
+                # Row 0 is the merged title, already written
+                for row_num, cells in enumerate(rows[1:], 1):
+                    for col_num, (value, cell_fmt) in enumerate(cells):
+                        ws.write(row_num, col_num, value, cell_fmt)
 
-                    adjusted_width = min(max_length + 2, 20)
-                    ws.column_dimensions[column_letter].width = adjusted_width
-
-        # Create summary sheet
-        summary_ws = wb.create_sheet(title="SDL2_REAL_Summary", index=0)
-        summary_ws['A1'] = "SDL2 Real Camera Analysis Summary"
-        summary_ws['A1'].font = Font(bold=True, size=16)
-
-        row = 3
-        total_tested = 0
-        total_successful = 0
-
-        for device_path, device_data in self.analysis_results.items():
-            summary_ws.cell(row=row, column=1, value=f"Device: {device_path}").font = Font(bold=True)
-            row += 1
-
-            for format_name, format_results in device_data.items():
-                successful = len([r for r in format_results if r['success']])
-                total = len(format_results)
-
-                total_tested += total
-                total_successful += successful
+                # Auto-adjust column widths (the title merge reaches column H)
+                for col_num in range(max(8, max(len(cells) for cells in rows))):
+                    max_length = 0
 
-                summary_ws.cell(row=row, column=2, value=f"{format_name}: {successful}/{total} combinations successful")
-                row += 1
-            row += 1
+                    for cells in rows:
+                        if col_num < len(cells):
+                            value = cells[col_num][0]
+                            if value and len(str(value)) > max_length:
+                                max_length = len(str(value))
 
-        summary_ws.cell(row=row, column=1, value=f"TOTAL: {total_successful}/{total_tested} combinations successful").font = Font(bold=True, size=14)
+                    ws.set_column(col_num, col_num, min(max_length + 2, 20))
 
-        wb.save(self.output_excel)
+        wb.close()
         print(f"SDL2 analysis Excel file saved: {self.output_excel}")
 
     def run(self):
         """Main application loop"""
         while self.running:
-            # Handle timer events
-            for event in pygame.event.get():
-                if event.type == pygame.USEREVENT + 1:
-                    # Run next test
-                    self.run_next_test()
-                elif event.type == pygame.USEREVENT + 2:
-                    # Finish current recording
-                    self.finish_test_recording()
-                else:
-                    # Put the event back for normal handling
-                    pygame.event.post(event)
-                    break
-
-            self.handle_events()
-            self.draw_ui()
-            self.clock.tick(30)  # 30 FPS
+            # Sleep until input or an analysis timer arrives instead of polling at 30 FPS
+            event = pygame.event.wait(1000)
+            if event.type != pygame.NOEVENT:
+                self.handle_events([event] + pygame.event.get())
+
+            if self._dirty:
+                self._dirty = False
+                self.draw_ui()
 
         pygame.quit()
 
@@ -8,6 +8,7 @@ import glob
 import subprocess
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Check display before importing heavy modules
@@ -36,13 +37,11 @@ if not check_display():
 # Check if required modules are available
 try:
     import pandas as pd
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
-    from openpyxl.utils import get_column_letter
+    import xlsxwriter
 except ImportError as e:
     print(f"Required module missing: {e}")
     print("Please install required modules:")
-    print("pip install pandas openpyxl")
+    print("pip install pandas xlsxwriter")
     sys.exit(1)
 
 # Set environment variables before importing pygame/gi
@@ -62,7 +61,26 @@ except ImportError as e:
     print("GStreamer python bindings required")
     sys.exit(1)
 
+# v4l2-ctl --list-formats-ext tokens: format (groups 1-3), size (4-5), interval (6)
+_TOKEN_RE = re.compile(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)"
+                       r"|Size:\s+Discrete\s+(\d+)x(\d+)"
+                       r"|Interval:\s+Discrete\s+[\d.]+s\s+\(([\d.]+)\s+fps\)")
+
+# Bordered, centred and wrapped; shared by every table cell format
+_CELL_PROPS = {'border': 1, 'align': 'center', 'valign': 'vcenter', 'text_wrap': True}
+
 class SafeSDL2CameraAnalyzer:
+    # xlsxwriter format properties per cell class; handles are created once per workbook
+    _EXCEL_FORMATS = {
+        'header': dict(_CELL_PROPS, bold=True, font_color='#FFFFFF', bg_color='#4472C4', pattern=1),
+        'data': _CELL_PROPS,
+        'success': dict(_CELL_PROPS, bg_color='#C6EFCE', pattern=1),
+        'fail': dict(_CELL_PROPS, bg_color='#FFC7CE', pattern=1),
+        'title': {'bold': True, 'font_size': 14},
+        'summary_title': {'bold': True, 'font_size': 16},
+        'bold': {'bold': True},
+    }
+
     def __init__(self):
         print("Initializing SDL2 Camera Analyzer...")
 
@@ -119,6 +137,9 @@ class SafeSDL2CameraAnalyzer:
             self.font_medium = pygame.font.SysFont('arial', 24)
             self.font_small = pygame.font.SysFont('arial', 18)
 
+        # Rendered text surfaces, keyed by (text, font, color); most labels repeat every frame
+        self._text_cache = {}
+
         # Analysis settings
         self.recording_duration = 15  # seconds
         self.wait_duration = 16  # seconds
@@ -153,7 +174,8 @@ class SafeSDL2CameraAnalyzer:
 
         # Start main loop
         self.running = True
-        self.clock = pygame.time.Clock()
+        # Set by anything that changes what is on screen; the loop only redraws when it is set
+        self._dirty = True
 
     def create_display(self):
         """Create display with progressive fallback"""
@@ -199,44 +221,26 @@ class SafeSDL2CameraAnalyzer:
 
             capabilities = {}
             current_format = None
+            current_resolution = None
 
-            lines = result.stdout.split('\n')
-
-            for line in lines:
-                line = line.strip()
-
-                # Look for format lines
-                format_match = re.search(r"\[(\d+)\]:\s+'([^']+)'\s+\(([^)]+)\)", line)
-                if format_match:
-                    format_code = format_match.group(2)
-                    format_desc = format_match.group(3)
-                    current_format = format_code
+            # One pass over the whole output; no per-line split
+            for token in _TOKEN_RE.finditer(result.stdout):
+                if token.group(2) is not None:
+                    current_format = token.group(2)
+                    current_resolution = None
                     capabilities[current_format] = {
-                        'description': format_desc,
+                        'description': token.group(3),
                         'resolutions': {}
                     }
-                    continue
 
-                # Look for size lines
-                size_match = re.search(r"Size:\s+Discrete\s+(\d+)x(\d+)", line)
-                if size_match and current_format:
-                    width = int(size_match.group(1))
-                    height = int(size_match.group(2))
-                    resolution = (width, height)
+                elif token.group(4) is not None:
+                    if current_format:
+                        current_resolution = (int(token.group(4)), int(token.group(5)))
+                        capabilities[current_format]['resolutions'].setdefault(current_resolution, [])
 
-                    if resolution not in capabilities[current_format]['resolutions']:
-                        capabilities[current_format]['resolutions'][resolution] = []
-                    continue
-
-                # Look for interval lines
-                interval_match = re.search(r"Interval:\s+Discrete\s+[\d.]+s\s+\(([\d.]+)\s+fps\)", line)
-                if interval_match and current_format:
-                    fps = float(interval_match.group(1))
+                elif current_resolution:
                     # Add this fps to the last resolution found
-                    resolutions = capabilities[current_format]['resolutions']
-                    if resolutions:
-                        last_resolution = list(resolutions.keys())[-1]
-                        capabilities[current_format]['resolutions'][last_resolution].append(fps)
+                    capabilities[current_format]['resolutions'][current_resolution].append(float(token.group(6)))
 
             return capabilities
 
@@ -246,10 +250,18 @@ class SafeSDL2CameraAnalyzer:
 
     def get_real_device_capabilities(self):
         """Get video devices and their REAL capabilities from v4l2-ctl"""
-        for device_path in glob.glob('/dev/video*'):
+        device_paths = sorted(glob.glob('/dev/video*'))
+        for device_path in device_paths:
+            print(f"Checking {device_path}...")
+
+        # Probes are just v4l2-ctl subprocess waits, so run them side by side;
+        # results are still collected in device order
+        with ThreadPoolExecutor(max_workers=min(8, len(device_paths) or 1)) as executor:
+            probes = [executor.submit(self.parse_v4l2_output, device_path) for device_path in device_paths]
+
+        for device_path, probe in zip(device_paths, probes):
             try:
-                print(f"Checking {device_path}...")
-                capabilities = self.parse_v4l2_output(device_path)
+                capabilities = probe.result()
 
                 if capabilities:
                     device_info = {
@@ -279,6 +291,17 @@ class SafeSDL2CameraAnalyzer:
         except Exception as e:
             print(f"Error creating temp directory: {e}")
 
+    def render_text(self, text, font, color):
+        """Render text once and reuse the surface on later frames"""
+        key = (text, font, color)
+        text_surface = self._text_cache.get(key)
+        if text_surface is None:
+            # Progress and test labels change every test; keep the cache from growing unbounded
+            if len(self._text_cache) >= 256:
+                self._text_cache.clear()
+            text_surface = self._text_cache[key] = font.render(text, True, color)
+        return text_surface
+
     def draw_button(self, rect, text, color, text_color=None, enabled=True):
         """Draw a button with text"""
         try:
@@ -291,7 +314,7 @@ class SafeSDL2CameraAnalyzer:
             if text_color is None:
                 text_color = self.WHITE if color == self.BLUE else self.BLACK
 
-            text_surface = self.font_medium.render(text, True, text_color)
+            text_surface = self.render_text(text, self.font_medium, text_color)
             text_rect = text_surface.get_rect(center=rect.center)
             self.screen.blit(text_surface, text_rect)
         except Exception as e:
@@ -302,7 +325,7 @@ class SafeSDL2CameraAnalyzer:
         try:
             if color is None:
                 color = self.BLACK
-            text_surface = font.render(str(text), True, color)
+            text_surface = self.render_text(str(text), font, color)
             self.screen.blit(text_surface, (x, y))
             return text_surface.get_height()
         except Exception as e:
@@ -316,13 +339,13 @@ class SafeSDL2CameraAnalyzer:
 
             # Title
             title = "SDL2 Camera Analysis"
-            title_surface = self.font_large.render(title, True, self.BLUE)
+            title_surface = self.render_text(title, self.font_large, self.BLUE)
             title_rect = title_surface.get_rect(center=(self.screen_width // 2, 40))
             self.screen.blit(title_surface, title_rect)
 
             # Subtitle
             subtitle = f"Real-time analysis of {self.total_combinations} combinations"
-            subtitle_surface = self.font_medium.render(subtitle, True, self.BLACK)
+            subtitle_surface = self.render_text(subtitle, self.font_medium, self.BLACK)
             subtitle_rect = subtitle_surface.get_rect(center=(self.screen_width // 2, 70))
             self.screen.blit(subtitle_surface, subtitle_rect)
 
@@ -405,10 +428,14 @@ class SafeSDL2CameraAnalyzer:
         except Exception as e:
             print(f"Error drawing device info: {e}")
 
-    def handle_events(self):
+    def handle_events(self, events):
         """Handle SDL2 events"""
         try:
-            for event in pygame.event.get():
+            for event in events:
+                # Pointer motion alone changes nothing on screen
+                if event.type != pygame.MOUSEMOTION:
+                    self._dirty = True
+
                 if event.type == pygame.QUIT:
                     self.running = False
 
@@ -647,17 +674,36 @@ class SafeSDL2CameraAnalyzer:
         """Generate Excel file with real measured data"""
         print(f"Generating Excel file: {self.output_excel}")
 
-        wb = Workbook()
-        wb.remove(wb.active)
+        wb = xlsxwriter.Workbook(self.output_excel)
 
-        # Define styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        success_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")
-        fail_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")
-        border = Border(left=Side(style='thin'), right=Side(style='thin'),
-                       top=Side(style='thin'), bottom=Side(style='thin'))
-        center_align = Alignment(horizontal='center', vertical='center', wrap_text=True)
+        # One handle per cell class, shared by every cell of that class
+        fmt = {name: wb.add_format(props) for name, props in self._EXCEL_FORMATS.items()}
+        works_fmt = {"✓": fmt['success'], "✗": fmt['fail']}
+
+        # Create summary sheet first so it stays at index 0
+        summary_ws = wb.add_worksheet("SAFE_SDL2_Summary")
+        summary_ws.write(0, 0, "Safe SDL2 Real Camera Analysis Summary", fmt['summary_title'])
+
+        row = 2
+        total_tested = 0
+        total_successful = 0
+
+        for device_path, device_data in self.analysis_results.items():
+            summary_ws.write(row, 0, f"Device: {device_path}", fmt['bold'])
+            row += 1
+
+            for format_name, format_results in device_data.items():
+                successful = len([r for r in format_results if r['success']])
+                total = len(format_results)
+
+                total_tested += total
+                total_successful += successful
+
+                summary_ws.write(row, 1, f"{format_name}: {successful}/{total} combinations successful")
+                row += 1
+            row += 1
+
+        summary_ws.write(row, 0, f"TOTAL: {total_successful}/{total_tested} combinations successful", fmt['title'])
 
         # Process each device/format combination
         for device_path, device_data in self.analysis_results.items():
@@ -669,7 +715,7 @@ class SafeSDL2CameraAnalyzer:
 
                 # Create worksheet
                 sheet_name = f"{device_name}_{format_name}"
-                ws = wb.create_sheet(title=sheet_name)
+                ws = wb.add_worksheet(sheet_name)
 
                 # Convert to DataFrame
                 df_data = []
@@ -688,61 +734,21 @@ class SafeSDL2CameraAnalyzer:
                 df = pd.DataFrame(df_data)
 
                 # Write title
-                ws['A1'] = f"SAFE SDL2 REAL DATA: {device_path} - {format_name}"
-                ws['A1'].font = Font(bold=True, size=14)
-                ws.merge_cells('A1:H1')
+                ws.merge_range('A1:H1', f"SAFE SDL2 REAL DATA: {device_path} - {format_name}", fmt['title'])
 
                 # Simple data table (skip complex matrix for now)
-                row = 3
+                row = 2
                 headers = ['Resolution', 'FPS', 'Real Bitrate (kbps)', 'Real File Size 15s (MB)', 'Works']
-                for col, header in enumerate(headers, 1):
-                    cell = ws.cell(row=row, column=col, value=header)
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = center_align
-                    cell.border = border
+                ws.write_row(row, 0, headers, fmt['header'])
 
                 row += 1
                 for _, data in df.iterrows():
-                    for col, header in enumerate(headers, 1):
-                        cell = ws.cell(row=row, column=col, value=data[header])
-                        cell.alignment = center_align
-                        cell.border = border
-
-                        if header == 'Works':
-                            if data[header] == "✓":
-                                cell.fill = success_fill
-                            else:
-                                cell.fill = fail_fill
+                    for col, header in enumerate(headers[:-1]):
+                        ws.write(row, col, data[header], fmt['data'])
+                    ws.write(row, len(headers) - 1, data['Works'], works_fmt[data['Works']])
                     row += 1
 
-        # Create summary sheet
-        summary_ws = wb.create_sheet(title="SAFE_SDL2_Summary", index=0)
-        summary_ws['A1'] = "Safe SDL2 Real Camera Analysis Summary"
-        summary_ws['A1'].font = Font(bold=True, size=16)
-
-        row = 3
-        total_tested = 0
-        total_successful = 0
-
-        for device_path, device_data in self.analysis_results.items():
-            summary_ws.cell(row=row, column=1, value=f"Device: {device_path}").font = Font(bold=True)
-            row += 1
-
-            for format_name, format_results in device_data.items():
-                successful = len([r for r in format_results if r['success']])
-                total = len(format_results)
-
-                total_tested += total
-                total_successful += successful
-
-                summary_ws.cell(row=row, column=2, value=f"{format_name}: {successful}/{total} combinations successful")
-                row += 1
-            row += 1
-
-        summary_ws.cell(row=row, column=1, value=f"TOTAL: {total_successful}/{total_tested} combinations successful").font = Font(bold=True, size=14)
-
-        wb.save(self.output_excel)
+        wb.close()
         print(f"Safe SDL2 analysis Excel file saved: {self.output_excel}")
 
     def run(self):
@@ -750,9 +756,14 @@ class SafeSDL2CameraAnalyzer:
         print("Starting main application loop...")
         try:
             while self.running:
-                self.handle_events()
-                self.draw_ui()
-                self.clock.tick(30)  # 30 FPS
+                # Sleep until input or an analysis timer arrives instead of polling at 30 FPS
+                event = pygame.event.wait(1000)
+                if event.type != pygame.NOEVENT:
+                    self.handle_events([event] + pygame.event.get())
+
+                if self._dirty:
+                    self._dirty = False
+                    self.draw_ui()
 
         except Exception as e:
             print(f"Error in main loop: {e}")
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# test_parse_v4l2_timeout.py - A hung v4l2-ctl must not stall the console analyzer
+import os
+import stat
+import tempfile
+import time
+import unittest
+
+from console_camera_analysis import ConsoleCameraAnalyzer
+
+FAKE_V4L2_CTL = """#!/bin/sh
+echo "ioctl: VIDIOC_ENUM_FMT"
+echo "	[0]: 'MJPG' (Motion-JPEG, compressed)"
+exec sleep 12
+"""
+
+class ParseV4l2TimeoutTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        fake = os.path.join(self.tmpdir.name, 'v4l2-ctl')
+        with open(fake, 'w') as f:
+            f.write(FAKE_V4L2_CTL)
+        os.chmod(fake, os.stat(fake).st_mode | stat.S_IXUSR)
+        self.old_path = os.environ['PATH']
+        os.environ['PATH'] = self.tmpdir.name + os.pathsep + self.old_path
+
+    def tearDown(self):
+        os.environ['PATH'] = self.old_path
+        self.tmpdir.cleanup()
+
+    def test_hung_child_returns_empty_within_timeout(self):
+        # __init__ prompts for an output filename; parsing needs no instance state
+        analyzer = ConsoleCameraAnalyzer.__new__(ConsoleCameraAnalyzer)
+        start = time.monotonic()
+        capabilities = analyzer.parse_v4l2_output('/dev/video0')
+        elapsed = time.monotonic() - start
+        self.assertEqual(capabilities, {})
+        self.assertLess(elapsed, 6.0)
+
+if __name__ == '__main__':
+    unittest.main()
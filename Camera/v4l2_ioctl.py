@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# v4l2_ioctl.py - Query V4L2 formats/sizes/frame rates with direct ioctls instead of forking v4l2-ctl
+
+import os
+import errno
+import fcntl
+import struct
+
+# ioctl request numbers (_IOR/_IOWR('V', nr, struct ...))
+VIDIOC_QUERYCAP = 0x80685600
+VIDIOC_ENUM_FMT = 0xC0405602
+VIDIOC_ENUM_FRAMESIZES = 0xC02C564A
+VIDIOC_ENUM_FRAMEINTERVALS = 0xC034564B
+
+V4L2_BUF_TYPE_VIDEO_CAPTURE = 1
+V4L2_BUF_TYPE_VIDEO_CAPTURE_MPLANE = 9
+V4L2_FRMSIZE_TYPE_DISCRETE = 1
+V4L2_FRMIVAL_TYPE_DISCRETE = 1
+
+# struct v4l2_capability: driver[16], card[32], bus_info[32], version, capabilities, device_caps, reserved[3]
+_CAPABILITY = struct.Struct('=16s32s32sIII12x')
+# struct v4l2_fmtdesc: index, type, flags, description[32], pixelformat, mbus_code, reserved[3]
+_FMTDESC = struct.Struct('=III32sII12x')
+# struct v4l2_frmsizeenum: index, pixel_format, type, discrete {width, height}, rest of union, reserved[2]
+_FRMSIZEENUM = struct.Struct('=IIIII24x')
+# struct v4l2_frmivalenum: index, pixel_format, width, height, type, discrete {numerator, denominator}, rest of union, reserved[2]
+_FRMIVALENUM = struct.Struct('=IIIIIII24x')
+
+
+def open_device(device_path):
+    """Open a video node for queries only (non-blocking, no streaming)"""
+    return os.open(device_path, os.O_RDWR | os.O_NONBLOCK)
+
+
+def query_bus_info(fd):
+    """bus_info from VIDIOC_QUERYCAP, e.g. 'usb-xhci-hcd.1-1'; stable across node renumbering"""
+    buf = bytearray(_CAPABILITY.size)
+    fcntl.ioctl(fd, VIDIOC_QUERYCAP, buf)
+    return _CAPABILITY.unpack(buf)[2].split(b'\0', 1)[0].decode('utf-8', 'replace')
+
+
+def _enum(fd, request, layout, *fields):
+    """Run one VIDIOC_ENUM_* ioctl; None once the index runs past the last entry"""
+    buf = bytearray(layout.pack(*fields))
+    try:
+        fcntl.ioctl(fd, request, buf)
+    except OSError as e:
+        # EINVAL ends the enumeration, ENOTTY means the node doesn't support it
+        if e.errno in (errno.EINVAL, errno.ENOTTY):
+            return None
+        raise
+    return layout.unpack(buf)
+
+
+def fourcc_to_str(pixelformat):
+    """Format code as printed by v4l2-ctl, e.g. 'MJPG' or 'Y16 -BE'"""
+    code = (pixelformat & 0x7FFFFFFF).to_bytes(4, 'little').decode('ascii', 'replace')
+    return code + '-BE' if pixelformat & (1 << 31) else code
+
+
+def enum_formats(fd, buf_type=V4L2_BUF_TYPE_VIDEO_CAPTURE):
+    """List (pixelformat, fourcc, description) for every format the node offers"""
+    formats = []
+    index = 0
+    while True:
+        entry = _enum(fd, VIDIOC_ENUM_FMT, _FMTDESC, index, buf_type, 0, b'', 0, 0)
+        if entry is None:
+            return formats
+        pixelformat = entry[4]
+        description = entry[3].split(b'\0', 1)[0].decode('utf-8', 'replace')
+        formats.append((pixelformat, fourcc_to_str(pixelformat), description))
+        index += 1
+
+
+def enum_frame_sizes(fd, pixelformat):
+    """List discrete (width, height) sizes for a pixel format"""
+    sizes = []
+    index = 0
+    while True:
+        entry = _enum(fd, VIDIOC_ENUM_FRAMESIZES, _FRMSIZEENUM, index, pixelformat, 0, 0, 0)
+        if entry is None or entry[2] != V4L2_FRMSIZE_TYPE_DISCRETE:
+            return sizes
+        sizes.append((entry[3], entry[4]))
+        index += 1
+
+
+def enum_frame_intervals(fd, pixelformat, width, height):
+    """List discrete frame rates (fps, rounded like v4l2-ctl) for a format and size"""
+    rates = []
+    index = 0
+    while True:
+        entry = _enum(fd, VIDIOC_ENUM_FRAMEINTERVALS, _FRMIVALENUM, index, pixelformat, width, height, 0, 0, 0)
+        if entry is None or entry[4] != V4L2_FRMIVAL_TYPE_DISCRETE:
+            return rates
+        numerator, denominator = entry[5], entry[6]
+        if numerator:
+            rates.append(round(denominator / numerator, 3))
+        index += 1
+
+
+def list_formats_ext(fd):
+    """Same data as `v4l2-ctl --list-formats-ext`:
+    {fourcc: {'description': str, 'resolutions': {(width, height): {fps, ...}}}}"""
+    formats = enum_formats(fd) or enum_formats(fd, V4L2_BUF_TYPE_VIDEO_CAPTURE_MPLANE)
+
+    capabilities = {}
+    for pixelformat, fourcc, description in formats:
+        capabilities[fourcc] = {
+            'description': description,
+            'resolutions': {(width, height): set(enum_frame_intervals(fd, pixelformat, width, height))
+                            for width, height in enum_frame_sizes(fd, pixelformat)}
+        }
+    return capabilities